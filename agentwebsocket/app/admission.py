@@ -0,0 +1,219 @@
+"""Admission control and rate limiting for the client websocket endpoint.
+
+Every accepted connection starts a live model session, so a client that
+reconnects in a loop can exhaust upstream quota and worker memory. The
+`AdmissionController` caps concurrent sessions per worker and per user and
+rate-limits reconnects; `SessionLimits` rate-limits inbound messages and audio
+bytes within a session. Limits are read from the environment.
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from metrics import METRICS
+
+# Concurrent live sessions allowed per worker process and per user
+MAX_SESSIONS_PER_WORKER = int(os.environ.get("PIKACHU_MAX_SESSIONS", "32"))
+MAX_SESSIONS_PER_USER = int(os.environ.get("PIKACHU_MAX_SESSIONS_PER_USER", "2"))
+
+# New connections per user: sustained rate per second and burst
+CONNECT_RATE_PER_USER = float(os.environ.get("PIKACHU_CONNECT_RATE", "0.5"))
+CONNECT_BURST_PER_USER = float(os.environ.get("PIKACHU_CONNECT_BURST", "3"))
+
+# Inbound non-audio messages per session: sustained rate per second and burst.
+# Audio frames are only charged to the audio byte budget below: the browser
+# client sends one frame per 128-sample AudioWorklet chunk, 125 per second.
+MESSAGE_RATE = float(os.environ.get("PIKACHU_MESSAGE_RATE", "100"))
+MESSAGE_BURST = float(os.environ.get("PIKACHU_MESSAGE_BURST", "200"))
+
+# Inbound audio per session in bytes. 16 kHz 16-bit mono PCM is 32000 bytes/s.
+AUDIO_BYTES_RATE = float(os.environ.get("PIKACHU_AUDIO_BYTES_RATE", "64000"))
+AUDIO_BYTES_BURST = float(os.environ.get("PIKACHU_AUDIO_BYTES_BURST", "128000"))
+
+# Minimum seconds between log lines about dropped inbound frames of a session
+DROP_LOG_INTERVAL_S = 10.0
+
+# Idle per-user connect buckets are pruned once there are this many
+MAX_TRACKED_USERS = 10_000
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, amount: float = 1) -> bool:
+        """Take `amount` tokens if available."""
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def retry_after(self, amount: float = 1) -> float:
+        """Seconds until `amount` tokens will be available."""
+        self._refill()
+        if self.tokens >= amount or self.rate <= 0:
+            return 0.0
+        return (min(amount, self.capacity) - self.tokens) / self.rate
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class AdmissionController:
+    """Decides whether a new websocket session may start."""
+
+    def __init__(
+        self,
+        max_sessions: int = MAX_SESSIONS_PER_WORKER,
+        max_sessions_per_user: int = MAX_SESSIONS_PER_USER,
+        connect_rate: float = CONNECT_RATE_PER_USER,
+        connect_burst: float = CONNECT_BURST_PER_USER,
+    ):
+        self.max_sessions = max_sessions
+        self.max_sessions_per_user = max_sessions_per_user
+        self.connect_rate = connect_rate
+        self.connect_burst = connect_burst
+        self.active = 0
+        self._per_user: Dict[str, int] = {}
+        self._connect_buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._connect_buckets.get(user_id)
+        if bucket is None:
+            if len(self._connect_buckets) >= MAX_TRACKED_USERS:
+                self._connect_buckets = {
+                    u: b for u, b in self._connect_buckets.items()
+                    if not b.full or self._per_user.get(u)
+                }
+            bucket = self._connect_buckets[user_id] = TokenBucket(self.connect_rate, self.connect_burst)
+        return bucket
+
+    def admit(self, user_id: str) -> Tuple[bool, float, Optional[str]]:
+        """Try to admit a new session for `user_id`.
+
+        Returns:
+            (admitted, retry_after_seconds, reason) where reason is None when admitted
+        """
+        bucket = self._bucket(user_id)
+        if not bucket.try_take():
+            return self._reject("connect_rate", bucket.retry_after())
+        if self.active >= self.max_sessions:
+            return self._reject("worker_full", 5.0)
+        if self._per_user.get(user_id, 0) >= self.max_sessions_per_user:
+            return self._reject("user_full", 5.0)
+
+        self.active += 1
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        METRICS.incr("admission.accepted")
+        METRICS.set_gauge("admission.active_sessions", self.active)
+        return True, 0.0, None
+
+    def _reject(self, reason: str, retry_after: float) -> Tuple[bool, float, Optional[str]]:
+        METRICS.incr("admission.rejected")
+        METRICS.incr(f"admission.rejected.{reason}")
+        return False, round(max(retry_after, 0.1), 1), reason
+
+    def release(self, user_id: str) -> None:
+        """Mark a previously admitted session of `user_id` as finished."""
+        count = self._per_user.get(user_id, 0)
+        if count <= 1:
+            self._per_user.pop(user_id, None)
+        else:
+            self._per_user[user_id] = count - 1
+        self.active = max(0, self.active - 1)
+        METRICS.set_gauge("admission.active_sessions", self.active)
+
+
+class SessionLimits:
+    """Per-session limits on inbound messages and audio bytes."""
+
+    def __init__(
+        self,
+        message_rate: float = MESSAGE_RATE,
+        message_burst: float = MESSAGE_BURST,
+        audio_bytes_rate: float = AUDIO_BYTES_RATE,
+        audio_bytes_burst: float = AUDIO_BYTES_BURST,
+    ):
+        self.messages = TokenBucket(message_rate, message_burst)
+        self.audio_bytes = TokenBucket(audio_bytes_rate, audio_bytes_burst)
+        self._drops = 0
+        self._last_drop_log: Optional[float] = None
+
+    def _dropped(self, kind: str) -> None:
+        # Log drops at most every DROP_LOG_INTERVAL_S, not for every frame
+        self._drops += 1
+        now = time.monotonic()
+        if self._last_drop_log is None or now - self._last_drop_log >= DROP_LOG_INTERVAL_S:
+            print(f"[ADMISSION]: session over its inbound {kind} limit, {self._drops} frame(s) dropped")
+            self._last_drop_log = now
+            self._drops = 0
+
+    def allow_message(self) -> bool:
+        """Charge one non-audio message."""
+        if self.messages.try_take():
+            return True
+        METRICS.incr("inbound.messages_dropped")
+        self._dropped("message")
+        return False
+
+    def allow_audio(self, nbytes: int) -> bool:
+        """Charge an audio frame of `nbytes` decoded bytes; audio does not count as messages."""
+        if self.audio_bytes.try_take(nbytes):
+            return True
+        METRICS.incr("inbound.audio_bytes_dropped", nbytes)
+        self._dropped("audio")
+        return False
+
+
+def _connect_storm(users: int = 20, attempts: int = 2000, hold: float = 0.5) -> None:
+    """Simulate clients reconnecting in a tight loop and report admission counters."""
+    import random
+
+    controller = AdmissionController(max_sessions=8, max_sessions_per_user=2)
+    sessions = []  # (user_id, ends_at)
+    started = time.perf_counter()
+    for _ in range(attempts):
+        now = time.monotonic()
+        for session in [s for s in sessions if s[1] <= now]:
+            controller.release(session[0])
+            sessions.remove(session)
+        user_id = str(random.randrange(users))
+        admitted, _, _ = controller.admit(user_id)
+        if admitted:
+            sessions.append((user_id, now + hold))
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+
+    counters = METRICS.snapshot()["counters"]
+    print(f"{attempts} connects from {users} users in {elapsed:.2f}s, session cap {controller.max_sessions}:")
+    for name, value in sorted(counters.items()):
+        if name.startswith("admission."):
+            print(f"  {name}: {value:g}")
+
+
+__all__ = [
+    "TokenBucket",
+    "AdmissionController",
+    "SessionLimits",
+    "MAX_SESSIONS_PER_WORKER",
+    "MAX_SESSIONS_PER_USER",
+]
+
+
+if __name__ == "__main__":
+    _connect_storm()
@@ -3,50 +3,137 @@
 This module shows how to create an agent with all available tools including
 clipboard, cursor control, file access, and web search.
 """
+from dataclasses import replace
+
 from google.adk.agents import Agent
 from google.adk.tools import google_search
 
-from tools import (
-    make_clipboard_tool,
-    make_context_call_tool,
-    make_cursor_move_tool,
-    make_file_open_tool,
-)
-try:
-    # When imported as a package: app.agent_factory
-    from .tools import (
-        get_selected_text,
-    )
-except Exception:
-    # When imported as a script: agent_factory in PYTHONPATH
-    from tools import (
-        get_selected_text,
-    )
+from tool_dispatcher import ToolDispatcher
+from context_budget import ContextBudget
+from tool_cache import CachePolicy, ToolCache, SCOPE_GLOBAL, SCOPE_SESSION, memoize
+from tools.workspace import WORKSPACE, WorkspaceRegistry
+
+# Number of allowed external files listed by name in the agent's instruction
+MAX_LISTED_EXTERNAL_FILES = 20
+
+def _opened_file_hit(result, tool_context):
+    from tools.file_open import record_opened_file
+    record_opened_file(tool_context, result["path"])
 
-# Specific files the agent is allowed to access from external projects
-ALLOWED_EXTERNAL_FILES = [
-    "/Users/aryan/projects/Pikachu-Pair-Programming-Demo/pokemon-app/app/page.tsx",
-]
 
-def create_full_agent(websocket_callback=None):
+def _context_read_hit(result, tool_context):
+    from tools.context_call import record_context_read
+    record_context_read(tool_context, result["path"])
+
+
+def _context_paths(workspace: WorkspaceRegistry):
+    return [workspace.context_file] if workspace.context_file else []
+
+
+# Caching policies for tools whose results can be reused within a short window.
+# File-backed results are invalidated as soon as the file's mtime changes, and
+# the tools' session state updates are applied again on cache hits.
+TOOL_CACHE_POLICIES = {
+    "open_project_file": CachePolicy(
+        ttl=30.0,
+        max_entries=64,
+        scope=SCOPE_SESSION,
+        key=lambda kwargs: kwargs.get("path"),
+        paths=lambda kwargs: [WORKSPACE.locate(kwargs["path"])[0]],
+        on_hit=_opened_file_hit,
+    ),
+    "read_context_file": CachePolicy(
+        ttl=60.0,
+        max_entries=1,
+        scope=SCOPE_GLOBAL,
+        key=lambda kwargs: None,
+        paths=lambda kwargs: _context_paths(WORKSPACE),
+        on_hit=_context_read_hit,
+    ),
+}
+
+def create_full_agent(
+    websocket_callback=None,
+    dispatcher: ToolDispatcher | None = None,
+    budget: ContextBudget | None = None,
+    workspace: WorkspaceRegistry | None = None,
+):
     """Create an agent with all available tools.
     
     Args:
         websocket_callback: Optional WebSocket callback for clipboard and cursor tools
+        dispatcher: Optional ToolDispatcher that runs the function tools with
+            deadlines and lets the session cancel them when it ends
+        budget: Optional ContextBudget that shrinks large file results to fit
+            the session's context
+        workspace: Optional WorkspaceRegistry with the roots and files this
+            session may read; defaults to the configured workspace
         
     Returns:
         Configured Agent instance
     """
+    # Tool modules are imported here rather than at module level, so importing
+    # this module does not load them (the selection helpers in particular)
+    from tools import (
+        make_clipboard_tool,
+        make_context_call_tool,
+        make_cursor_move_tool,
+        make_file_open_tool,
+    )
+    try:
+        # When imported as a package: app.agent_factory
+        from .tools import (
+            get_selected_text,
+        )
+    except Exception:
+        # When imported as a script: agent_factory in PYTHONPATH
+        from tools import (
+            get_selected_text,
+        )
+
+    if workspace is None:
+        workspace = WORKSPACE
+
     # Create tool instances
-    file_open_tool = make_file_open_tool(allowed_external_files=ALLOWED_EXTERNAL_FILES)
-    context_call_tool = make_context_call_tool()
+    file_open_tool = make_file_open_tool(workspace=workspace)
+    context_call_tool = make_context_call_tool(workspace=workspace)
     clipboard_tool = make_clipboard_tool(websocket_callback)
     cursor_tool = make_cursor_move_tool(websocket_callback)
-    
+    selection_tool = get_selected_text
+
+    # Serve repeated file reads from cache (see TOOL_CACHE_POLICIES)
+    session_cache = ToolCache()
+    file_policy = TOOL_CACHE_POLICIES["open_project_file"]
+    context_policy = TOOL_CACHE_POLICIES["read_context_file"]
+    if workspace is not WORKSPACE:
+        # A session with its own workspace must not share cached reads with others
+        file_policy = replace(file_policy, paths=lambda kwargs: [workspace.locate(kwargs["path"])[0]])
+        context_policy = replace(context_policy, scope=SCOPE_SESSION, paths=lambda kwargs: _context_paths(workspace))
+    file_open_tool = memoize(file_open_tool, file_policy, session_cache)
+    context_call_tool = memoize(context_call_tool, context_policy, session_cache)
+
+    # Keep large file contents from flooding the live session's context
+    if budget is not None:
+        file_open_tool = budget.wrap(file_open_tool)
+        context_call_tool = budget.wrap(context_call_tool)
+
+    # Route function tools through the dispatcher. google_search is a built-in
+    # tool executed by the model itself, so it is passed through unchanged.
+    if dispatcher is not None:
+        file_open_tool = dispatcher.wrap(file_open_tool)
+        context_call_tool = dispatcher.wrap(context_call_tool)
+        clipboard_tool = dispatcher.wrap(clipboard_tool)
+        cursor_tool = dispatcher.wrap(cursor_tool)
+        selection_tool = dispatcher.wrap(selection_tool)
 
     # Create the agent with all tools
-    available_tools = [google_search, get_selected_text]
+    available_tools = [google_search, selection_tool]
     print(f"Available tools: {[getattr(t, 'name', str(t)) for t in available_tools]}")
+
+    # Keep the instruction short when the allowlist is long
+    external_files = [str(f) for f in workspace.allowed_files[:MAX_LISTED_EXTERNAL_FILES]]
+    if len(workspace.allowed_files) > MAX_LISTED_EXTERNAL_FILES:
+        external_files.append(f"and {len(workspace.allowed_files) - MAX_LISTED_EXTERNAL_FILES} more")
     
     agent = Agent(
         name="pikachu_full_agent",
@@ -65,7 +152,8 @@ def create_full_agent(websocket_callback=None):
             "Your available tools:\n"
             "- read_context_file: Read the Context.MD file to understand current project requirements, goals, and conventions\n"
             "- open_project_file: Read and analyze any file in the current project or specific external files:\n"
-            f"  * External files: {', '.join(ALLOWED_EXTERNAL_FILES)}\n"
+            f"  * Project roots: {', '.join(str(r) for r in workspace.roots)}\n"
+            f"  * External files: {', '.join(external_files)}\n"
             "  Use the full absolute path or just the filename to access external files.\n"
             "- google_search: Search the web for current information, documentation, and best practices\n"
             "- push_clipboard_prompt: Send code snippets or text to the user's clipboard for easy pasting\n"
@@ -85,6 +173,8 @@ def create_full_agent(websocket_callback=None):
             "• When users ask about their pokemon-app project, read the external files to understand the codebase\n\n"
             "Remember, for simple questions by the user, keep response super short, a few words. Respond like a human being would!"
             "Remember: You're a thinking partner, not just a code generator. Challenge ideas, suggest improvements, and help build better software through critical analysis and collaborative problem-solving."
+            # Conversation of a session resumed after a drain, see drain.resume_note
+            "{resumed_transcript?}"
         ),
         tools=[
             context_call_tool,
@@ -92,11 +182,11 @@ def create_full_agent(websocket_callback=None):
             google_search,
             clipboard_tool,
             cursor_tool,
-            get_selected_text,
+            selection_tool,
         ],
     )
 
     return agent
 
 
-__all__ = ["create_full_agent"]
+__all__ = ["create_full_agent", "TOOL_CACHE_POLICIES"]
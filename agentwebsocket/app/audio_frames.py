@@ -0,0 +1,123 @@
+"""Fast encoding and decoding of audio frames on the relay path.
+
+Audio is the bulk of the relay's traffic: every chunk of PCM is base64-encoded
+into a JSON text frame going out and decoded from one coming in. The generic
+path (`json.loads`/`json.dumps`, `base64.b64encode(...).decode()`) builds a
+dict and copies each chunk several times. Audio frames have a fixed shape, so
+they are built and parsed directly with `binascii`:
+
+- Outgoing, the base64 text is produced once and spliced into the frame with
+  a single string build, without a dict or `json.dumps` (which would scan and
+  copy the payload again).
+- Incoming, frames in the exact shape the browser sends are decoded from the
+  payload slice with `a2b_base64`; anything else falls back to `json.loads`.
+
+Fully zero-copy is not possible here: the ASGI websocket API takes an owned
+`str` per text frame and genai's `Blob` an owned `bytes`, and `binascii`
+cannot write into a preallocated buffer, so buffer pools would only add a copy.
+"""
+from __future__ import annotations
+
+import binascii
+from typing import Optional
+
+# Outgoing audio frame, byte-for-byte what json.dumps produced before
+AUDIO_FRAME_PREFIX = '{"mime_type": "audio/pcm", "data": "'
+AUDIO_FRAME_SUFFIX = '"}'
+
+# Incoming audio frame as sent by the browser (JSON.stringify, no spaces)
+CLIENT_AUDIO_PREFIX = '{"mime_type":"audio/pcm","data":"'
+CLIENT_AUDIO_SUFFIX = '"}'
+
+
+def encode_audio_frame(data: bytes) -> str:
+    """Build the outgoing JSON text frame for a chunk of PCM audio."""
+    encoded = binascii.b2a_base64(data, newline=False).decode("ascii")
+    return f"{AUDIO_FRAME_PREFIX}{encoded}{AUDIO_FRAME_SUFFIX}"
+
+
+def decode_audio_frame(frame: str) -> Optional[bytes]:
+    """Return the PCM audio of a client audio frame, or None if `frame` is not one.
+
+    Only frames in the browser's exact shape are decoded; callers fall back to
+    `json.loads` for everything else.
+    """
+    if not (frame.startswith(CLIENT_AUDIO_PREFIX) and frame.endswith(CLIENT_AUDIO_SUFFIX)):
+        return None
+    payload = frame[len(CLIENT_AUDIO_PREFIX):-len(CLIENT_AUDIO_SUFFIX)]
+    if '"' in payload:
+        return None
+    try:
+        return binascii.a2b_base64(payload)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _benchmark(chunks: int = 2000, chunk_bytes: int = 3200) -> None:
+    """Measure per-chunk allocations and time of the generic and the fast path."""
+    import base64
+    import json
+    import os
+    import time
+    import tracemalloc
+
+    pcm = os.urandom(chunk_bytes)
+    client_frame = json.dumps({"mime_type": "audio/pcm", "data": base64.b64encode(pcm).decode("ascii")}, separators=(",", ":"))
+
+    def encode_generic(data: bytes) -> str:
+        return json.dumps({"mime_type": "audio/pcm", "data": base64.b64encode(data).decode("ascii")})
+
+    def decode_generic(frame: str) -> bytes:
+        return base64.b64decode(json.loads(frame)["data"])
+
+    def decode_fast(frame: str) -> bytes:
+        data = decode_audio_frame(frame)
+        return data if data is not None else decode_generic(frame)
+
+    assert encode_audio_frame(pcm) == encode_generic(pcm)
+    assert decode_fast(client_frame) == pcm
+
+    def measure(func, arg):
+        # Warm up, then trace: peak transient allocation per chunk and what is left behind
+        for _ in range(100):
+            func(arg)
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        peak_total = 0
+        for _ in range(chunks):
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            func(arg)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - start
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        for _ in range(chunks):
+            func(arg)
+        elapsed = time.perf_counter() - started
+        return peak_total / chunks, (after - before) / chunks, elapsed / chunks * 1e6
+
+    print(f"{chunks} chunks of {chunk_bytes} bytes PCM ({len(client_frame)} byte frames):")
+    print(f"{'':18} {'peak/chunk':>12} {'retained/chunk':>15} {'time/chunk':>11}")
+    for name, func, arg in (
+        ("encode generic", encode_generic, pcm),
+        ("encode fast", encode_audio_frame, pcm),
+        ("decode generic", decode_generic, client_frame),
+        ("decode fast", decode_fast, client_frame),
+    ):
+        peak, retained, micros = measure(func, arg)
+        print(f"{name:18} {peak:10.0f} B {retained:13.1f} B {micros:9.2f} us")
+
+
+__all__ = [
+    "encode_audio_frame",
+    "decode_audio_frame",
+    "AUDIO_FRAME_PREFIX",
+    "CLIENT_AUDIO_PREFIX",
+]
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,223 @@
+"""Token budgeting for large tool results.
+
+`open_project_file` and `read_context_file` return whole files. Every token
+they add stays in the live session's context and slows down later turns, so
+results are passed through a `ContextBudget` that estimates their token cost
+and, when a result does not fit the per-turn or per-session budget, replaces
+the content with excerpts around the requested lines or an outline of the file.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import re
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+from metrics import METRICS
+
+# Rough size of a token for source code and prose
+CHARS_PER_TOKEN = 4
+
+# Default budgets in tokens
+DEFAULT_TURN_BUDGET = 8_000
+DEFAULT_SESSION_BUDGET = 64_000
+DEFAULT_MAX_RESULT_TOKENS = 4_000
+
+# Lines of context kept around each focus match
+EXCERPT_CONTEXT_LINES = 6
+
+# Number of outlines kept in the summary cache
+OUTLINE_CACHE_SIZE = 64
+
+# Lines that describe a file's structure: definitions, exports and headings
+OUTLINE_RE = re.compile(
+    r"^\s*(?:async\s+def|def|class|function|export|interface|type|struct|impl|fn)\b|^#{1,6}\s"
+)
+
+_outline_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in `text`."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    limit = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit("\n", 1)[0] + "\n..."
+
+
+def outline(content: str) -> str:
+    """Return the structural lines of a file, prefixed with line numbers.
+
+    Outlines are cached by content hash so repeated reads of a large file do
+    not rescan it.
+    """
+    digest = hashlib.sha1(content.encode("utf-8", errors="replace")).hexdigest()
+    cached = _outline_cache.get(digest)
+    if cached is not None:
+        _outline_cache.move_to_end(digest)
+        return cached
+
+    lines = [
+        f"{n}: {line.rstrip()}"
+        for n, line in enumerate(content.splitlines(), start=1)
+        if OUTLINE_RE.match(line)
+    ]
+    result = "\n".join(lines)
+    _outline_cache[digest] = result
+    if len(_outline_cache) > OUTLINE_CACHE_SIZE:
+        _outline_cache.popitem(last=False)
+    return result
+
+
+def excerpts(content: str, focus: str, context: int = EXCERPT_CONTEXT_LINES) -> str:
+    """Return numbered excerpts around the lines relevant to `focus`.
+
+    `focus` is either a line number (e.g. "120") or text to search for,
+    case-insensitively.
+    """
+    lines = content.splitlines()
+    focus = focus.strip()
+    if focus.isdigit():
+        hits = [int(focus) - 1]
+    else:
+        needle = focus.lower()
+        hits = [i for i, line in enumerate(lines) if needle in line.lower()]
+
+    ranges: List[Tuple[int, int]] = []
+    for i in hits:
+        start, end = max(0, i - context), min(len(lines), i + context + 1)
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+
+    blocks = [
+        "\n".join(f"{n + 1}: {lines[n]}" for n in range(start, end))
+        for start, end in ranges
+    ]
+    return "\n...\n".join(blocks)
+
+
+class ContextBudget:
+    """Per-session token budget for tool results."""
+
+    def __init__(
+        self,
+        turn_budget: int = DEFAULT_TURN_BUDGET,
+        session_budget: int = DEFAULT_SESSION_BUDGET,
+        max_result_tokens: int = DEFAULT_MAX_RESULT_TOKENS,
+    ):
+        self.turn_budget = turn_budget
+        self.session_budget = session_budget
+        self.max_result_tokens = max_result_tokens
+        self.turn_used = 0
+        self.session_used = 0
+
+    def new_turn(self) -> None:
+        """Reset the per-turn budget once the model finishes a turn."""
+        self.turn_used = 0
+
+    def remaining(self) -> int:
+        """Tokens the next tool result may use."""
+        return max(0, min(
+            self.turn_budget - self.turn_used,
+            self.session_budget - self.session_used,
+            self.max_result_tokens,
+        ))
+
+    def limit_reached(self) -> Optional[str]:
+        """Which budget is used up: "session", "turn", or None."""
+        if self.session_used >= self.session_budget:
+            return "session"
+        if self.turn_used >= self.turn_budget:
+            return "turn"
+        return None
+
+    def charge(self, tokens: int) -> None:
+        self.turn_used += tokens
+        self.session_used += tokens
+        METRICS.incr("context_budget.tokens", tokens)
+
+    def fit(self, content: str, focus: Optional[str] = None) -> Tuple[str, str]:
+        """Fit `content` into the remaining budget.
+
+        Returns:
+            (content, mode) where mode is "full", "excerpt", "outline" or "omitted"
+        """
+        budget = self.remaining()
+        if estimate_tokens(content) <= budget:
+            return content, "full"
+        if budget <= 0:
+            return "", "omitted"
+
+        if focus:
+            text = excerpts(content, focus)
+            if text:
+                return _truncate(text, budget), "excerpt"
+
+        text = outline(content)
+        if text:
+            return _truncate(text, budget), "outline"
+        return "", "omitted"
+
+    def wrap(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap an async tool that returns {"content": ...} so its content fits the budget."""
+        accepts_focus = "focus" in inspect.signature(func).parameters
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            result = await func(*args, **kwargs)
+            if not isinstance(result, dict) or not isinstance(result.get("content"), str):
+                return result
+
+            content = result["content"]
+            full_tokens = estimate_tokens(content)
+            fitted, mode = self.fit(content, kwargs.get("focus"))
+            self.charge(estimate_tokens(fitted))
+            METRICS.incr(f"context_budget.results.{mode}")
+            if mode == "full":
+                return result
+
+            print(f"[CONTEXT BUDGET]: {func.__name__} returned {mode} of ~{full_tokens} tokens")
+            result = dict(result, content=fitted, truncated=True, mode=mode)
+            if mode == "omitted":
+                limit = self.limit_reached()
+                if limit == "session":
+                    result["note"] = "Context budget for this session is used up; the file content was not returned."
+                elif limit == "turn":
+                    result["note"] = (
+                        "Context budget for this turn is used up; the file content was not returned. "
+                        "It can be read again in a later turn."
+                    )
+                else:
+                    result["note"] = (
+                        f"The file is about {full_tokens} tokens, too large for the remaining context budget, "
+                        "and has no outline; the file content was not returned."
+                    )
+            else:
+                result["note"] = (
+                    f"The file is about {full_tokens} tokens, too large for the remaining context budget, "
+                    f"so only the {mode} is returned with line numbers."
+                )
+                if accepts_focus:
+                    result["note"] += " Call again with focus set to a line number or search text to see that part."
+            return result
+
+        return wrapper
+
+
+__all__ = [
+    "ContextBudget",
+    "estimate_tokens",
+    "outline",
+    "excerpts",
+    "DEFAULT_TURN_BUDGET",
+    "DEFAULT_SESSION_BUDGET",
+    "DEFAULT_MAX_RESULT_TOKENS",
+]
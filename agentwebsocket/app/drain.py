@@ -0,0 +1,198 @@
+"""Graceful draining of live websocket sessions.
+
+Before a worker is restarted it is put into drain mode: new sessions are
+refused, sessions in the middle of a model turn get until a deadline to finish
+it, and every session's state is persisted under a resume token. Clients are
+then told to reconnect (to this or another worker) with that token, and the
+new session starts from the saved state. The saved transcript is added to the
+new session's instruction (see `resume_note`); it only holds text turns, so
+audio sessions resume with their tool state but without the conversation.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from metrics import METRICS
+
+# Seconds in-flight turns get to finish once draining starts
+DRAIN_DEADLINE_S = float(os.environ.get("PIKACHU_DRAIN_DEADLINE", "20"))
+
+# Where resumable session state is written. Point this at shared storage so
+# another worker can pick the session up.
+DRAIN_STATE_DIR = Path(os.environ.get("PIKACHU_DRAIN_STATE_DIR", ".drain_state"))
+
+# Number of transcript entries kept in the persisted state
+RESUME_TRANSCRIPT_LIMIT = 50
+
+# Websocket close code for "service restart"
+CLOSE_SERVICE_RESTART = 1012
+
+
+@dataclass
+class LiveSession:
+    """Bookkeeping for one connected client."""
+
+    user_id: str
+    session_id: str
+    channel: Any
+    live_request_queue: Any
+    websocket: Any
+    idle: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def __post_init__(self):
+        self.idle.set()
+
+    def turn_started(self) -> None:
+        self.idle.clear()
+
+    def turn_finished(self) -> None:
+        self.idle.set()
+
+
+def _transcript(session: Any) -> List[Dict[str, str]]:
+    entries = []
+    for event in getattr(session, "events", None) or []:
+        content = getattr(event, "content", None)
+        for part in (content and content.parts) or []:
+            if getattr(part, "text", None):
+                entries.append({"role": content.role or "model", "text": part.text})
+    return entries[-RESUME_TRANSCRIPT_LIMIT:]
+
+
+def resume_note(transcript: List[Dict[str, str]]) -> str:
+    """Instruction text that gives a resumed session the conversation so far."""
+    if not transcript:
+        return ""
+    lines = [f"{entry.get('role', 'model')}: {entry.get('text', '')}" for entry in transcript]
+    return (
+        "\n\nThis conversation was moved to a new server. Continue it from where it "
+        "left off without mentioning the move. Conversation so far:\n" + "\n".join(lines)
+    )
+
+
+class SessionRegistry:
+    """Tracks live sessions of this worker and drains them on request."""
+
+    def __init__(self, state_dir: Path = DRAIN_STATE_DIR):
+        self.state_dir = state_dir
+        self.draining = False
+        self._sessions: Dict[int, LiveSession] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def register(self, live_session: LiveSession) -> LiveSession:
+        self._sessions[id(live_session)] = live_session
+        return live_session
+
+    def unregister(self, live_session: LiveSession) -> None:
+        self._sessions.pop(id(live_session), None)
+
+    async def refuse(self, websocket: Any) -> bool:
+        """Send a new client elsewhere while draining; returns whether it was refused."""
+        if not self.draining:
+            return False
+        await websocket.send_text(json.dumps({"error": "draining", "retry_after": 1}))
+        await websocket.close(code=CLOSE_SERVICE_RESTART, reason="server draining")
+        return True
+
+    async def hand_over_if_draining(self, live_session: LiveSession, session_service: Any, app_name: str) -> bool:
+        """Hand over a session registered after `drain()` took its snapshot.
+
+        A connection that passed the draining check before the drain started
+        but registered after it would otherwise never be handed over.
+        """
+        if not self.draining:
+            return False
+        await self._hand_over(live_session, session_service, app_name)
+        METRICS.incr("drain.sessions_handed_over")
+        return True
+
+    def persist(self, user_id: str, state: Dict[str, Any], transcript: List[Dict[str, str]]) -> str:
+        """Write resumable state to disk and return its resume token."""
+        token = uuid.uuid4().hex
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "user_id": user_id,
+            "saved_at": time.time(),
+            "state": state,
+            "transcript": transcript,
+        }
+        (self.state_dir / f"{token}.json").write_text(json.dumps(payload, default=str), encoding="utf-8")
+        return token
+
+    def load(self, token: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Load and consume the state saved under `token` for `user_id`."""
+        if not token.isalnum():
+            return None
+        path = self.state_dir / f"{token}.json"
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if payload.get("user_id") != user_id:
+            return None
+        path.unlink(missing_ok=True)
+        METRICS.incr("drain.sessions_resumed")
+        return payload
+
+    async def _hand_over(self, live_session: LiveSession, session_service: Any, app_name: str) -> None:
+        session = await session_service.get_session(
+            app_name=app_name,
+            user_id=live_session.user_id,
+            session_id=live_session.session_id,
+        )
+        state = dict(session.state) if session is not None else {}
+        token = self.persist(live_session.user_id, state, _transcript(session))
+
+        await live_session.channel.send_text(json.dumps({
+            "message_type": "reconnect",
+            "resume_token": token,
+            "retry_after": 1,
+        }))
+        await live_session.channel.flush()
+        live_session.live_request_queue.close()
+        await live_session.websocket.close(code=CLOSE_SERVICE_RESTART, reason="server draining")
+
+    async def drain(self, session_service: Any, app_name: str, deadline: float = DRAIN_DEADLINE_S) -> Dict[str, int]:
+        """Stop accepting sessions, let in-flight turns finish, then hand sessions over.
+
+        Returns:
+            Counts of sessions handed over and of turns cut off at the deadline
+        """
+        self.draining = True
+        METRICS.set_gauge("drain.draining", 1)
+        sessions = list(self._sessions.values())
+        print(f"[DRAIN]: draining {len(sessions)} session(s), deadline {deadline}s")
+
+        busy = [s.idle.wait() for s in sessions if not s.idle.is_set()]
+        if busy:
+            try:
+                await asyncio.wait_for(asyncio.gather(*busy), timeout=deadline)
+            except asyncio.TimeoutError:
+                pass
+        cut_off = sum(1 for s in sessions if not s.idle.is_set())
+
+        results = await asyncio.gather(
+            *(self._hand_over(s, session_service, app_name) for s in sessions),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[DRAIN]: hand-over failed: {result}")
+        handed_over = sum(1 for r in results if not isinstance(r, Exception))
+
+        METRICS.incr("drain.sessions_handed_over", handed_over)
+        METRICS.incr("drain.turns_cut_off", cut_off)
+        print(f"[DRAIN]: handed over {handed_over} session(s), {cut_off} turn(s) cut off")
+        return {"handed_over": handed_over, "turns_cut_off": cut_off}
+
+
+__all__ = ["LiveSession", "SessionRegistry", "resume_note", "DRAIN_DEADLINE_S", "DRAIN_STATE_DIR"]
@@ -0,0 +1,179 @@
+"""Event-loop lag monitor and slow-callback profiler.
+
+A heartbeat task measures how late the event loop wakes it up. A watchdog
+thread notices when the heartbeat stops and captures the stack of whatever is
+blocking the loop, together with the name of the running task, which carries
+the session and tool (see `ToolDispatcher` and `websocket_endpoint`).
+Optionally a short sampling profile of the loop thread is taken while it is
+stalled. Results are served on `/admin/loop`.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Deque, Dict, List, Optional
+
+from metrics import METRICS
+
+# Heartbeat period in seconds
+LAG_SAMPLE_INTERVAL_S = 0.1
+
+# Stalls longer than this are reported with their stack
+SLOW_CALLBACK_THRESHOLD_S = float(os.environ.get("PIKACHU_SLOW_CALLBACK_S", "0.1"))
+
+# Take a sampling profile of the loop thread while it is stalled
+PROFILE_ON_STALL = os.environ.get("PIKACHU_PROFILE_ON_STALL", "0") == "1"
+PROFILE_DURATION_S = 1.0
+PROFILE_INTERVAL_S = 0.005
+
+# Number of lag samples and slow callbacks kept for the report
+LAG_HISTORY = 600
+SLOW_CALLBACK_HISTORY = 50
+
+
+def _task_name(loop: asyncio.AbstractEventLoop) -> Optional[str]:
+    # Read from the watchdog thread; good enough for attribution in CPython.
+    # _current_tasks is private, so never let a change to it stop the watchdog.
+    current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+    try:
+        task = current_tasks.get(loop) if current_tasks is not None else None
+        return task.get_name() if task is not None else None
+    except Exception:
+        return None
+
+
+class LoopMonitor:
+    """Measures event-loop scheduling lag and records slow callbacks."""
+
+    def __init__(
+        self,
+        interval: float = LAG_SAMPLE_INTERVAL_S,
+        threshold: float = SLOW_CALLBACK_THRESHOLD_S,
+        profile_on_stall: bool = PROFILE_ON_STALL,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.profile_on_stall = profile_on_stall
+        self.lags: Deque[float] = collections.deque(maxlen=LAG_HISTORY)
+        self.slow_callbacks: Deque[Dict[str, Any]] = collections.deque(maxlen=SLOW_CALLBACK_HISTORY)
+        self.last_profile: Optional[Dict[str, Any]] = None
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._stall: Optional[Dict[str, Any]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._beat = now
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            METRICS.set_gauge("event_loop.lag_ms", lag * 1000)
+            METRICS.set_gauge("event_loop.max_lag_ms", self.max_lag * 1000)
+
+            stall = self._stall
+            if stall is not None:
+                # The watchdog saw this stall; record how late the loop really was
+                stall["lag_ms"] = round(lag * 1000, 1)
+                self._stall = None
+
+    def _capture(self) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        return {
+            "at": time.time(),
+            "task": _task_name(self._loop) if self._loop is not None else None,
+            "lag_ms": None,
+            "stack": [line.rstrip() for line in stack[-15:]],
+        }
+
+    def _watch(self) -> None:
+        poll = max(0.005, self.threshold / 4)
+        while not self._stop.wait(poll):
+            stalled_for = time.monotonic() - self._beat - self.interval
+            if stalled_for < self.threshold or self._stall is not None:
+                continue
+
+            stall = self._capture()
+            self._stall = stall
+            self.slow_callbacks.append(stall)
+            METRICS.incr("event_loop.slow_callbacks")
+            print(f"[LOOP MONITOR]: event loop blocked for >{self.threshold * 1000:.0f} ms in task {stall['task']}")
+            if self.profile_on_stall:
+                self.last_profile = self._sample()
+
+    def _sample(self, duration: float = PROFILE_DURATION_S, interval: float = PROFILE_INTERVAL_S) -> Dict[str, Any]:
+        """Sample the loop thread's stack while it is stalled and count collapsed stacks."""
+        counts: Dict[str, int] = collections.Counter()
+        samples = 0
+        beat = self._beat
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline and self._beat == beat:
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                names: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                counts[";".join(reversed(names))] += 1
+                samples += 1
+            time.sleep(interval)
+        return {
+            "at": time.time(),
+            "samples": samples,
+            "interval_ms": interval * 1000,
+            "stacks": dict(counts.most_common(20)),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Lag statistics, recent slow callbacks and the last profile."""
+        lags = sorted(self.lags)
+
+        def pct(p: float) -> float:
+            return round(lags[min(len(lags) - 1, int(p * len(lags)))] * 1000, 2) if lags else 0.0
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {"p50": pct(0.5), "p99": pct(0.99), "max": round(self.max_lag * 1000, 2)},
+            "slow_callbacks": list(self.slow_callbacks),
+            "profile": self.last_profile,
+        }
+
+
+__all__ = ["LoopMonitor", "SLOW_CALLBACK_THRESHOLD_S"]
@@ -1,29 +1,29 @@
 import os
 import json
+import hmac
 import asyncio
-import base64
+import binascii
+from contextlib import asynccontextmanager
 
 from pathlib import Path
 from dotenv import load_dotenv
 
-from google.genai.types import (
-    Part,
-    Content,
-    Blob,
-)
-
-from google.adk.runners import Runner
-from google.adk.agents import LiveRequestQueue
-from google.adk.agents.run_config import RunConfig
-from google.adk.sessions.in_memory_session_service import InMemorySessionService
-
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, WebSocket, Header, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-
-# Import agent factory and websocket helper utilities
-from agent_factory import create_full_agent
-from websocket_helper import create_websocket_callback
+from fastapi.responses import FileResponse, JSONResponse
+
+# google.adk, google.genai and the agent factory with its tools are loaded by
+# the warm-up after the server starts listening (see startup.py)
+from startup import Warmup
+from websocket_helper import WebSocketChannel, create_websocket_callback
+from tool_dispatcher import ToolDispatcher
+from context_budget import ContextBudget
+from metrics import METRICS
+from admission import AdmissionController, SessionLimits
+from drain import LiveSession, SessionRegistry, resume_note
+from loop_monitor import LoopMonitor
+from session_recorder import SessionRecorder
+from audio_frames import encode_audio_frame, decode_audio_frame
 
 # Load environment variables
 load_dotenv()
@@ -31,19 +31,58 @@ load_dotenv()
 # Application name for ADK
 APP_NAME = "adk-streaming-ws"
 
-# Initialize session service
-session_service = InMemorySessionService()
+# Session service, created by the warm-up
+session_service = None
+
+def _create_session_service():
+    global session_service
+    from google.adk.sessions.in_memory_session_service import InMemorySessionService
+    session_service = InMemorySessionService()
+
+# Heavy imports and initialization, run in a worker thread once the app starts
+warmup = Warmup([
+    ("google.genai", lambda: __import__("google.genai.types")),
+    ("google.adk", lambda: (__import__("google.adk.runners"), __import__("google.adk.agents.run_config"))),
+    ("agent_factory", lambda: __import__("agent_factory")),
+    ("session_service", _create_session_service),
+])
+
+# Caps concurrent sessions and reconnect rate per worker and per user
+admission = AdmissionController()
+
+# Live sessions of this worker, drained before a restart
+registry = SessionRegistry()
+
+# Shared secret for the /admin endpoints (X-Admin-Token header). Without it
+# they only answer requests from the same host.
+ADMIN_TOKEN = os.environ.get("PIKACHU_ADMIN_TOKEN")
+LOOPBACK_HOSTS = {"127.0.0.1", "::1"}
+
+# Watches for blocking code on the event loop (PIKACHU_LOOP_MONITOR=0 disables it)
+loop_monitor = LoopMonitor() if os.environ.get("PIKACHU_LOOP_MONITOR", "1") == "1" else None
 
 # Create agent instance once (singleton pattern for better performance)
 # NOTE: Clipboard and cursor tools require a websocket callback, so we
 # create the agent per connection with the callback rather than globally.
 
-async def start_agent_session(user_id, is_audio=False, websocket: WebSocket | None = None):
-    """Starts an agent session"""
-    
+async def start_agent_session(
+    user_id,
+    is_audio=False,
+    channel: WebSocketChannel | None = None,
+    resume_state: dict | None = None,
+):
+    """Starts an agent session, optionally from state saved by a draining worker"""
+    await warmup.wait()
+    from google.adk.runners import Runner
+    from google.adk.agents import LiveRequestQueue
+    from google.adk.agents.run_config import RunConfig
+    from agent_factory import create_full_agent
+
     # Create agent instance for this session (include websocket callback if available)
-    websocket_callback = create_websocket_callback(websocket) if websocket else None
-    agent = create_full_agent(websocket_callback)
+    websocket_callback = create_websocket_callback(channel) if channel else None
+    dispatcher = ToolDispatcher(label=f"session:{user_id}")
+    budget = ContextBudget()
+    agent = create_full_agent(websocket_callback, dispatcher=dispatcher, budget=budget)
 
     # Create a Runner with the configured agent
     runner = Runner(
@@ -52,10 +91,16 @@ async def start_agent_session(user_id, is_audio=False, websocket: WebSocket | No
         session_service=session_service,
     )
 
-    # Create a Session
+    # Create a Session, restoring tool state and the transcript of a drained session.
+    # The agent's instruction includes {resumed_transcript?}.
+    state = None
+    if resume_state is not None:
+        state = dict(resume_state.get("state") or {})
+        state["resumed_transcript"] = resume_note(resume_state.get("transcript") or [])
     session = await runner.session_service.create_session(
         app_name=APP_NAME,
         user_id=user_id,  # Replace with actual user ID
+        state=state,
     )
 
     # Set response modality
@@ -77,19 +122,41 @@ async def start_agent_session(user_id, is_audio=False, websocket: WebSocket | No
         live_request_queue=live_request_queue,
         run_config=run_config,
     )
-    return live_events, live_request_queue
-
-async def agent_to_client_messaging(websocket, live_events):
+    return live_events, live_request_queue, dispatcher, budget, session
+
+async def agent_to_client_messaging(
+    channel,
+    live_events,
+    budget: ContextBudget | None = None,
+    live_session: LiveSession | None = None,
+    recorder: SessionRecorder | None = None,
+):
     """Agent to client communication"""
+    from google.genai.types import Part
+
     try:
         async for event in live_events:
+            if recorder is not None:
+                recorder.event(event)
+
+            # Track whether a model turn is in flight so draining can wait for it
+            if live_session is not None:
+                if event.turn_complete or event.interrupted:
+                    live_session.turn_finished()
+                elif event.content:
+                    live_session.turn_started()
+
+            # Tool results of the next turn get a fresh per-turn budget
+            if event.turn_complete and budget is not None:
+                budget.new_turn()
+
             # If the turn complete or interrupted, send it
             if event.turn_complete or event.interrupted:
                 message = {
                     "turn_complete": event.turn_complete,
                     "interrupted": event.interrupted,
                 }
-                await websocket.send_text(json.dumps(message))
+                await channel.send_text(json.dumps(message))
                 print(f"[AGENT TO CLIENT]: {message}")
                 continue
 
@@ -105,11 +172,7 @@ async def agent_to_client_messaging(websocket, live_events):
             if is_audio:
                 audio_data = part.inline_data and part.inline_data.data
                 if audio_data:
-                    message = {
-                        "mime_type": "audio/pcm",
-                        "data": base64.b64encode(audio_data).decode("ascii")
-                    }
-                    await websocket.send_text(json.dumps(message))
+                    await channel.send_text(encode_audio_frame(audio_data))
                     print(f"[AGENT TO CLIENT]: audio/pcm: {len(audio_data)} bytes.")
                     continue
 
@@ -119,20 +182,42 @@ async def agent_to_client_messaging(websocket, live_events):
                     "mime_type": "text/plain",
                     "data": part.text
                 }
-                await websocket.send_text(json.dumps(message))
+                await channel.send_text(json.dumps(message))
                 print(f"[AGENT TO CLIENT]: text/plain: {message}")
     except Exception as e:
         print(f"Error in agent_to_client_messaging: {e}")
 
-async def client_to_agent_messaging(websocket, live_request_queue):
+async def client_to_agent_messaging(
+    websocket,
+    live_request_queue,
+    limits: SessionLimits | None = None,
+    recorder: SessionRecorder | None = None,
+):
     """Client to agent communication"""
+    from google.genai.types import Part, Content, Blob
+
     try:
         while True:
             # Decode JSON message
             message_json = await websocket.receive_text()
+            if recorder is not None:
+                recorder.inbound(message_json)
+
+            # Audio frames are decoded without going through json.loads and
+            # are only charged to the audio byte budget
+            decoded_data = decode_audio_frame(message_json)
+            if decoded_data is not None:
+                if limits is not None and not limits.allow_audio(len(decoded_data)):
+                    continue
+                live_request_queue.send_realtime(Blob(data=decoded_data, mime_type="audio/pcm"))
+                print(f"[CLIENT TO AGENT]: audio/pcm: {len(decoded_data)} bytes")
+                continue
+
             message = json.loads(message_json)
             mime_type = message["mime_type"]
             data = message["data"]
+            if mime_type != "audio/pcm" and limits is not None and not limits.allow_message():
+                continue
 
             # Send the message to the agent
             if mime_type == "text/plain":
@@ -142,7 +227,9 @@ async def client_to_agent_messaging(websocket, live_request_queue):
                 print(f"[CLIENT TO AGENT]: {data}")
             elif mime_type == "audio/pcm":
                 # Send an audio data
-                decoded_data = base64.b64decode(data)
+                decoded_data = binascii.a2b_base64(data)
+                if limits is not None and not limits.allow_audio(len(decoded_data)):
+                    continue
                 live_request_queue.send_realtime(Blob(data=decoded_data, mime_type=mime_type))
                 print(f"[CLIENT TO AGENT]: audio/pcm: {len(decoded_data)} bytes")
             else:
@@ -150,8 +237,18 @@ async def client_to_agent_messaging(websocket, live_request_queue):
     except Exception as e:
         print(f"Error in client_to_agent_messaging: {e}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts the warm-up and background monitors"""
+    if loop_monitor is not None:
+        loop_monitor.start()
+    warmup.start()
+    yield
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+
 # FastAPI application
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 STATIC_DIR = Path("static")
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
@@ -161,29 +258,109 @@ async def root():
     """Serves the index.html"""
     return FileResponse(os.path.join(STATIC_DIR, "index.html"))
 
+@app.get("/ready")
+async def ready():
+    """Reports whether the warm-up is done; 503 until the worker can start sessions"""
+    return JSONResponse(warmup.report(), status_code=200 if warmup.ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Returns the server's counters and gauges"""
+    return METRICS.snapshot()
+
+def _check_admin(request: Request, token: str | None) -> None:
+    if ADMIN_TOKEN:
+        if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+        return
+    # No token configured: only allow requests from this host
+    host = request.client.host if request.client else None
+    if host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Set PIKACHU_ADMIN_TOKEN to use admin endpoints remotely")
+
+@app.post("/admin/drain")
+async def drain(request: Request, deadline: float | None = None, x_admin_token: str | None = Header(default=None)):
+    """Stops accepting sessions and hands live ones over before a restart"""
+    _check_admin(request, x_admin_token)
+    kwargs = {"deadline": deadline} if deadline is not None else {}
+    result = await registry.drain(session_service, APP_NAME, **kwargs)
+    return {"draining": True, "active_sessions": len(registry), **result}
+
+@app.get("/admin/loop")
+async def loop_report(request: Request, x_admin_token: str | None = Header(default=None)):
+    """Reports event-loop lag, recent slow callbacks and the last stall profile"""
+    _check_admin(request, x_admin_token)
+    if loop_monitor is None:
+        raise HTTPException(status_code=404, detail="Loop monitor is disabled")
+    return loop_monitor.report()
+
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int, is_audio: str = "false"):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    user_id: int,
+    is_audio: str = "false",
+    resume: str | None = None,
+):
     """Client websocket endpoint"""
     
     # Wait for client connection
     await websocket.accept()
+
+    # A draining worker sends new clients elsewhere
+    if await registry.refuse(websocket):
+        return
+
+    # Reject right away, before any model session is started, when over limits
+    user_id_str = str(user_id)
+    admitted, retry_after, reason = admission.admit(user_id_str)
+    if not admitted:
+        print(f"Client #{user_id} rejected: {reason}, retry after {retry_after}s")
+        await websocket.send_text(json.dumps({"error": reason, "retry_after": retry_after}))
+        await websocket.close(code=1013, reason=reason)
+        return
     print(f"Client #{user_id} connected, audio mode: {is_audio}")
 
+    recorder = None
+    channel = None
+    live_session = None
+
     try:
+        # Opt-in recording for replay (PIKACHU_RECORD_DIR, see session_recorder.py)
+        recorder = SessionRecorder.open(user_id_str, is_audio == "true")
+
+        # All outbound frames go through one channel so audio is never stuck
+        # behind bursts of tool events
+        channel = WebSocketChannel(websocket, recorder=recorder)
+        channel.start()
+
         # Start agent session
-        user_id_str = str(user_id)
-        live_events, live_request_queue = await start_agent_session(
+        resume_state = registry.load(resume, user_id_str) if resume else None
+        live_events, live_request_queue, dispatcher, budget, session = await start_agent_session(
             user_id_str,
             is_audio == "true",
-            websocket=websocket,
+            channel=channel,
+            resume_state=resume_state,
         )
+        live_session = registry.register(LiveSession(
+            user_id=user_id_str,
+            session_id=session.id,
+            channel=channel,
+            live_request_queue=live_request_queue,
+            websocket=websocket,
+        ))
+
+        # A drain that started while this session was starting has not seen it
+        if await registry.hand_over_if_draining(live_session, session_service, APP_NAME):
+            return
 
         # Start tasks
         agent_to_client_task = asyncio.create_task(
-            agent_to_client_messaging(websocket, live_events)
+            agent_to_client_messaging(channel, live_events, budget, live_session, recorder),
+            name=f"session:{user_id_str} agent_to_client",
         )
         client_to_agent_task = asyncio.create_task(
-            client_to_agent_messaging(websocket, live_request_queue)
+            client_to_agent_messaging(websocket, live_request_queue, SessionLimits(), recorder),
+            name=f"session:{user_id_str} client_to_agent",
         )
 
         # Wait until the websocket is disconnected or an error occurs
@@ -198,12 +375,23 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int, is_audio: str =
             except asyncio.CancelledError:
                 pass
 
+        # Stop any tool calls that are still running
+        dispatcher.cancel_all()
+
         # Close LiveRequestQueue
         live_request_queue.close()
 
     except Exception as e:
         print(f"Error in websocket_endpoint: {e}")
     finally:
+        if live_session is not None:
+            registry.unregister(live_session)
+        if channel is not None:
+            await channel.close()
+        if recorder is not None:
+            recorder.close()
+        admission.release(user_id_str)
+
         # Disconnected
         print(f"Client #{user_id} disconnected")
 
@@ -0,0 +1,47 @@
+"""In-process metrics for the streaming server.
+
+Counters and gauges are kept in a single process-wide registry and exposed as
+JSON on the `/metrics` endpoint of the FastAPI app.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict
+
+
+class Metrics:
+    """A small thread-safe registry of named counters and gauges."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increase the counter `name` by `value`."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set the gauge `name` to `value`."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def get(self, name: str, default: float = 0) -> float:
+        """Return the current value of a counter or gauge."""
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name]
+            return self._gauges.get(name, default)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of all counters and gauges."""
+        with self._lock:
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+
+# Process-wide registry shared by the server and the tools
+METRICS = Metrics()
+
+
+__all__ = ["Metrics", "METRICS"]
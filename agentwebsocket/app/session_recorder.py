@@ -0,0 +1,125 @@
+"""Opt-in recording of live sessions for replay.
+
+When `PIKACHU_RECORD_DIR` is set, every websocket session writes a JSONL file
+there with one line per frame:
+
+    {"t": 0.0, "k": "meta", "version": 1, "user_id": "7", "is_audio": true, "audio": true}
+    {"t": 0.412, "k": "in", "frame": "{\"mime_type\": \"audio/pcm\", ...}"}
+    {"t": 0.950, "k": "ev", "mime_type": "audio/pcm", "data": "...", "partial": true}
+    {"t": 0.951, "k": "out", "n": 10962}
+
+`t` is seconds since the session started, "in" lines are client frames as
+received, "ev" lines are the live events of the model and "out" lines are the
+frames sent to the client (size only). With `PIKACHU_RECORD_AUDIO=0` audio is
+not stored, only its size, which keeps recordings small while still replaying
+the same traffic. `session_replay.py` replays recordings.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Directory for recordings; recording is off when unset
+RECORD_DIR = os.environ.get("PIKACHU_RECORD_DIR")
+
+# Store audio payloads (otherwise only their size)
+RECORD_AUDIO = os.environ.get("PIKACHU_RECORD_AUDIO", "1") == "1"
+
+RECORDING_VERSION = 1
+
+# Write buffer; recordings are flushed when it fills up and when the session ends
+WRITE_BUFFER_BYTES = 1 << 20
+
+
+def _is_audio_frame(frame: str) -> bool:
+    # Client frames start with their mime type, no need to parse the payload
+    return '"audio/pcm"' in frame[:40]
+
+
+def event_record(event: Any, audio: bool = True) -> Dict[str, Any]:
+    """Serialize the parts of a live event the relay looks at."""
+    record: Dict[str, Any] = {}
+    if event.turn_complete:
+        record["turn_complete"] = True
+    if event.interrupted:
+        record["interrupted"] = True
+    if event.partial:
+        record["partial"] = True
+
+    part = event.content and event.content.parts and event.content.parts[0]
+    if part:
+        if part.inline_data and part.inline_data.data:
+            record["mime_type"] = part.inline_data.mime_type
+            if audio:
+                record["data"] = base64.b64encode(part.inline_data.data).decode("ascii")
+            else:
+                record["nbytes"] = len(part.inline_data.data)
+        if part.text:
+            record["text"] = part.text
+    return record
+
+
+class SessionRecorder:
+    """Appends the frames of one session to a JSONL recording."""
+
+    def __init__(self, path: Path, user_id: str, is_audio: bool, audio: bool = RECORD_AUDIO):
+        self.path = path
+        self.audio = audio
+        self.started = time.perf_counter()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+        self._write({
+            "k": "meta",
+            "version": RECORDING_VERSION,
+            "user_id": user_id,
+            "is_audio": is_audio,
+            "audio": audio,
+            "started_at": time.time(),
+        })
+
+    @classmethod
+    def open(cls, user_id: str, is_audio: bool) -> Optional["SessionRecorder"]:
+        """Start a recording if `PIKACHU_RECORD_DIR` is set."""
+        if not RECORD_DIR:
+            return None
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{user_id}-{uuid.uuid4().hex[:6]}.jsonl"
+        recorder = cls(Path(RECORD_DIR) / name, user_id, is_audio)
+        print(f"[RECORDER]: recording session of client #{user_id} to {recorder.path}")
+        return recorder
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            return
+        record["t"] = round(time.perf_counter() - self.started, 6)
+        self._file.write(json.dumps(record, separators=(",", ":")))
+        self._file.write("\n")
+
+    def inbound(self, frame: str) -> None:
+        """Record a frame received from the client."""
+        if self.audio or not _is_audio_frame(frame):
+            self._write({"k": "in", "frame": frame})
+        else:
+            self._write({"k": "in", "mime_type": "audio/pcm", "n": len(frame)})
+
+    def event(self, event: Any) -> None:
+        """Record a live event of the model."""
+        record = event_record(event, self.audio)
+        record["k"] = "ev"
+        self._write(record)
+
+    def outbound(self, frame: str) -> None:
+        """Record that a frame was sent to the client."""
+        self._write({"k": "out", "n": len(frame)})
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+__all__ = ["SessionRecorder", "event_record", "RECORD_DIR", "RECORDING_VERSION"]
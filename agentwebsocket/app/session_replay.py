@@ -0,0 +1,339 @@
+"""Deterministic replay of recorded sessions through the relay.
+
+Feeds the client frames of a recording (see session_recorder.py) into
+`client_to_agent_messaging` and the recorded model events, produced by a
+stand-in model, into `agent_to_client_messaging` and a real `WebSocketChannel`.
+Frames are released in recorded order, either at their recorded times or as
+fast as possible, so two builds see exactly the same traffic. Reports relay
+throughput and latency and the change against a saved baseline:
+
+    python session_replay.py RECORDING [--speed fast|realtime] [--save OUT.json] [--baseline OLD.json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import bisect
+import json
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from audio_frames import AUDIO_FRAME_PREFIX, CLIENT_AUDIO_PREFIX
+
+# Changes smaller than this percentage are not flagged
+NOISE_PCT = 5.0
+
+
+class Recording:
+    """A parsed session recording."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.meta: Dict[str, Any] = {}
+        self.inbound: List[Tuple[float, str]] = []
+        self.events: List[Tuple[float, Dict[str, Any]]] = []
+        self.outbound: List[Tuple[float, int]] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record.pop("k")
+                t = record.pop("t")
+                if kind == "meta":
+                    self.meta = record
+                elif kind == "in":
+                    self.inbound.append((t, record.get("frame") or _audio_frame(record["n"])))
+                elif kind == "ev":
+                    self.events.append((t, record))
+                elif kind == "out":
+                    self.outbound.append((t, record["n"]))
+
+    def recorded_latencies(self) -> List[float]:
+        """Seconds from each model event to the next frame sent, as recorded."""
+        event_times = [t for t, _ in self.events]
+        return _latencies(event_times, [t for t, _ in self.outbound])
+
+
+def _audio_frame(size: int) -> str:
+    # Stand-in for a client audio frame recorded without its payload
+    prefix, suffix = CLIENT_AUDIO_PREFIX, '"}'
+    data_len = max(0, size - len(prefix) - len(suffix)) // 4 * 4
+    return prefix + "A" * data_len + suffix
+
+
+def _event(record: Dict[str, Any]) -> Any:
+    """Build an object that looks like an ADK live event to the relay."""
+    part = None
+    if "mime_type" in record:
+        data = base64.b64decode(record["data"]) if "data" in record else bytes(record.get("nbytes", 0))
+        inline_data = SimpleNamespace(mime_type=record["mime_type"], data=data)
+        part = SimpleNamespace(inline_data=inline_data, text=record.get("text"))
+    elif "text" in record:
+        part = SimpleNamespace(inline_data=None, text=record["text"])
+    return SimpleNamespace(
+        turn_complete=record.get("turn_complete", False),
+        interrupted=record.get("interrupted", False),
+        partial=record.get("partial", False),
+        content=SimpleNamespace(role="model", parts=[part]) if part else None,
+    )
+
+
+def _latencies(event_times: List[float], send_times: List[float]) -> List[float]:
+    latencies = []
+    for sent in send_times:
+        i = bisect.bisect_right(event_times, sent)
+        if i:
+            latencies.append(sent - event_times[i - 1])
+    return latencies
+
+
+def _summary_ms(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    values = sorted(values)
+
+    def pct(p: float) -> float:
+        return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 3)
+
+    return {"p50": pct(0.5), "p99": pct(0.99), "max": round(values[-1] * 1000, 3)}
+
+
+class ReplayClock:
+    """Releases the frames of all sources one at a time in recorded order."""
+
+    def __init__(self, timeline: List[Tuple[float, str]], realtime: bool):
+        self.timeline = sorted(timeline, key=lambda item: item[0])
+        self.realtime = realtime
+        self.cursor = 0
+        self.finished: set = set()
+        self.started = time.perf_counter()
+        self._cond = asyncio.Condition()
+
+    def _head(self) -> Optional[str]:
+        while self.cursor < len(self.timeline) and self.timeline[self.cursor][1] in self.finished:
+            self.cursor += 1
+        return self.timeline[self.cursor][1] if self.cursor < len(self.timeline) else None
+
+    async def next(self, source: str) -> None:
+        """Wait until the next frame of `source` is due."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._head() == source)
+            due = self.timeline[self.cursor][0]
+        if self.realtime:
+            delay = self.started + due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        async with self._cond:
+            self.cursor += 1
+            self._cond.notify_all()
+
+    async def finish(self, source: str) -> None:
+        """Skip the remaining frames of `source`."""
+        async with self._cond:
+            self.finished.add(source)
+            self._cond.notify_all()
+
+
+class _Disconnected(Exception):
+    pass
+
+
+class ReplayClientSocket:
+    """Client side of the websocket: sends recorded frames and collects sent ones."""
+
+    def __init__(self, clock: ReplayClock, frames: List[str]):
+        self.clock = clock
+        self.frames = frames
+        self.position = 0
+        self.send_times: List[float] = []
+        self.audio_send_times: List[float] = []
+        self.bytes_out = 0
+
+    async def receive_text(self) -> str:
+        if self.position >= len(self.frames):
+            raise _Disconnected("recording finished")
+        await self.clock.next("in")
+        frame = self.frames[self.position]
+        self.position += 1
+        return frame
+
+    async def send_text(self, text: str) -> None:
+        now = time.perf_counter()
+        self.send_times.append(now)
+        if text.startswith(AUDIO_FRAME_PREFIX):
+            self.audio_send_times.append(now)
+        self.bytes_out += len(text)
+
+
+class StandInModel:
+    """Produces the recorded live events in place of the model."""
+
+    def __init__(self, clock: ReplayClock, events: List[Any]):
+        self.clock = clock
+        self.events = events
+        self.emit_times: List[float] = []
+        self.turn_starts: List[float] = []
+
+    async def run_live(self):
+        turn_open = False
+        try:
+            for event in self.events:
+                await self.clock.next("ev")
+                now = time.perf_counter()
+                self.emit_times.append(now)
+                if not turn_open:
+                    self.turn_starts.append(now)
+                turn_open = not (event.turn_complete or event.interrupted)
+                yield event
+        finally:
+            await self.clock.finish("ev")
+
+
+class StandInRequestQueue:
+    """Counts what the relay forwards to the model."""
+
+    def __init__(self):
+        self.contents = 0
+        self.realtime_bytes = 0
+        self.closed = False
+
+    def send_content(self, content: Any) -> None:
+        self.contents += 1
+
+    def send_realtime(self, blob: Any) -> None:
+        self.realtime_bytes += len(blob.data)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _time_to_first_audio(turn_starts: List[float], audio_times: List[float]) -> List[float]:
+    """Seconds from the first event of each turn to its first audio frame sent."""
+    ttfa = []
+    for i, start in enumerate(turn_starts):
+        end = turn_starts[i + 1] if i + 1 < len(turn_starts) else float("inf")
+        j = bisect.bisect_left(audio_times, start)
+        if j < len(audio_times) and audio_times[j] < end:
+            ttfa.append(audio_times[j] - start)
+    return ttfa
+
+
+async def replay(recording: Recording, realtime: bool = False) -> Dict[str, Any]:
+    """Replay `recording` through the relay and return its report."""
+    from main import agent_to_client_messaging, client_to_agent_messaging
+    from websocket_helper import WebSocketChannel
+
+    events = [_event(record) for _, record in recording.events]
+    timeline = [(t, "in") for t, _ in recording.inbound] + [(t, "ev") for t, _ in recording.events]
+    clock = ReplayClock(timeline, realtime)
+    websocket = ReplayClientSocket(clock, [frame for _, frame in recording.inbound])
+    model = StandInModel(clock, events)
+    queue = StandInRequestQueue()
+    channel = WebSocketChannel(websocket)  # type: ignore[arg-type]
+
+    async def client_to_agent():
+        try:
+            await client_to_agent_messaging(websocket, queue)
+        finally:
+            await clock.finish("in")
+
+    started = time.perf_counter()
+    clock.started = started
+    channel.start()
+    await asyncio.gather(
+        agent_to_client_messaging(channel, model.run_live()),
+        client_to_agent(),
+    )
+    await channel.flush(timeout=10.0)
+    elapsed = time.perf_counter() - started
+    await channel.close()
+
+    frames_out = len(websocket.send_times)
+    return {
+        "recording": str(recording.path),
+        "speed": "realtime" if realtime else "fast",
+        "elapsed_s": round(elapsed, 4),
+        "events": len(events),
+        "frames_in": websocket.position,
+        "frames_out": frames_out,
+        "bytes_out": websocket.bytes_out,
+        "events_per_s": round(len(events) / elapsed, 1),
+        "frames_out_per_s": round(frames_out / elapsed, 1),
+        "mb_out_per_s": round(websocket.bytes_out / elapsed / 1e6, 3),
+        "audio_bytes_to_model": queue.realtime_bytes,
+        "relay_latency_ms": _summary_ms(_latencies(model.emit_times, websocket.send_times)),
+        "recorded_latency_ms": _summary_ms(recording.recorded_latencies()),
+        "time_to_first_audio_ms": _summary_ms(_time_to_first_audio(model.turn_starts, websocket.audio_send_times)),
+    }
+
+
+def _flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Lines describing how `current` differs from `baseline`."""
+    lines = []
+    old, new = _flatten(baseline), _flatten(current)
+    for key in new:
+        if key not in old:
+            continue
+        before, after = old[key], new[key]
+        change = (after - before) / before * 100 if before else 0.0
+        lines.append(f"  {key:28} {before:>12g} -> {after:>12g}  {change:+6.1f}%{_verdict(key, change)}")
+    return lines
+
+
+def _verdict(key: str, change: float) -> str:
+    # Throughput should go up, times and latencies down; other numbers are informational
+    if abs(change) < NOISE_PCT:
+        return ""
+    if key.endswith("_per_s"):
+        better = change > 0
+    elif "latency" in key or "time_to_first" in key or key == "elapsed_s":
+        better = change < 0
+    else:
+        return ""
+    return "  <-- better" if better else "  <-- worse"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded session through the relay")
+    parser.add_argument("recording", type=Path)
+    parser.add_argument("--speed", choices=("fast", "realtime"), default="fast")
+    parser.add_argument("--save", type=Path, help="Write the report as JSON, e.g. as the next baseline")
+    parser.add_argument("--baseline", type=Path, help="Report of an earlier build to compare against")
+    args = parser.parse_args()
+
+    recording = Recording(args.recording)
+    report = asyncio.run(replay(recording, realtime=args.speed == "realtime"))
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        for key in ("recording", "speed"):
+            if baseline.get(key) != report[key]:
+                print(f"Warning: baseline {key} is {baseline.get(key)!r}, this run used {report[key]!r}")
+        print(f"Compared with {args.baseline}:")
+        print("\n".join(compare(baseline, report)))
+
+
+__all__ = ["Recording", "ReplayClock", "StandInModel", "replay", "compare"]
+
+
+if __name__ == "__main__":
+    main()
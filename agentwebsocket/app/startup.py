@@ -0,0 +1,137 @@
+"""Deferred initialization of the server's heavy dependencies.
+
+Importing google.adk and google.genai takes most of the server's cold start.
+main.py only imports what it needs to build the FastAPI app, so uvicorn starts
+listening right away; everything else is loaded by a `Warmup` in a worker
+thread once the app has started. Sessions wait for the warm-up before they
+start and `/ready` reports when it is done, so a load balancer only routes
+clients to a warm worker.
+
+Run this module to measure import time of the entry point, lazy vs. eager:
+
+    python startup.py [module]
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from metrics import METRICS
+
+# Reference point for "ready after" timings: when the server started importing
+PROCESS_START = time.perf_counter()
+
+WarmupStep = Tuple[str, Callable[[], Any]]
+
+
+class Warmup:
+    """Runs initialization steps once, in order, in a worker thread."""
+
+    def __init__(self, steps: Sequence[WarmupStep]):
+        self.steps = list(steps)
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.ready_after: Optional[float] = None
+        self._task: Optional[asyncio.Future] = None
+        self._lock = threading.Lock()
+        self._done = False
+
+    @property
+    def ready(self) -> bool:
+        return self._done and self.error is None
+
+    def start(self) -> None:
+        """Start the warm-up in the background of the running event loop."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(asyncio.to_thread(self.run_sync))
+
+    async def wait(self) -> None:
+        """Wait for the warm-up, starting it if needed. Raises if a step failed."""
+        self.start()
+        await asyncio.shield(self._task)
+
+    def run_sync(self) -> None:
+        """Run the steps in the calling thread. Later calls return immediately."""
+        with self._lock:
+            if self._done:
+                return
+            try:
+                for name, step in self.steps:
+                    started = time.perf_counter()
+                    step()
+                    self.timings[name] = round(time.perf_counter() - started, 4)
+            except Exception as e:
+                self.error = f"{name}: {e}"
+                print(f"[WARMUP]: failed at {self.error}")
+                raise
+            finally:
+                self._done = True
+                self.ready_after = round(time.perf_counter() - PROCESS_START, 4)
+
+            METRICS.set_gauge("startup.warmup_s", sum(self.timings.values()))
+            METRICS.set_gauge("startup.ready_after_s", self.ready_after)
+            print(f"[WARMUP]: ready after {self.ready_after:.2f}s {self.timings}")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "ready_after_s": self.ready_after,
+            "steps_s": dict(self.timings),
+            "error": self.error,
+        }
+
+
+# Lines of `python -X importtime` output: "import time: self | cumulative | name"
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Return (module, depth, cumulative_us) for every import in `-X importtime` output."""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            depth = (len(match.group(3)) - 1) // 2
+            entries.append((match.group(4), depth, int(match.group(2))))
+    return entries
+
+
+def _measure(code: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def _benchmark(module: str = "main", top: int = 10) -> None:
+    """Compare the time to import the entry point with the time to fully warm it up."""
+    lazy_s, lazy = _measure(f"import {module}")
+    eager_s, eager = _measure(f"import {module}; getattr({module}, 'warmup', None) and {module}.warmup.run_sync()")
+
+    def cumulative(entries: List[Tuple[str, int, int]], name: str) -> float:
+        return next((us for mod, _, us in entries if mod == name), 0) / 1e6
+
+    print(f"import {module} (server can listen):   {lazy_s:.2f}s wall, {cumulative(lazy, module):.2f}s importing")
+    print(f"import {module} + warm-up (first session): {eager_s:.2f}s wall")
+    print("slowest top-level imports after warm-up:")
+    roots = sorted((e for e in eager if e[1] == 0), key=lambda e: e[2], reverse=True)
+    for name, _, us in roots[:top]:
+        print(f"  {us / 1000:9.1f} ms  {name}")
+
+
+__all__ = ["Warmup", "parse_importtime", "PROCESS_START"]
+
+
+if __name__ == "__main__":
+    _benchmark(*sys.argv[1:2])
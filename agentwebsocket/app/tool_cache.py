@@ -0,0 +1,227 @@
+"""Memoization of tool results with per-tool policies.
+
+Repeated calls such as opening the same project file or re-reading Context.MD
+within a short window can be answered from memory. Each cached tool has a
+`CachePolicy` describing how long results live, how calls are keyed, how many
+entries to keep and whether the cache is per session or shared by the process.
+Entries remember the modification time of the files they were read from,
+taken before the tool runs, and are dropped as soon as one of those files
+changes. Side effects of a tool on session state are replayed on cache hits
+through the policy's `on_hit`.
+"""
+from __future__ import annotations
+
+import functools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from metrics import METRICS
+
+SCOPE_SESSION = "session"
+SCOPE_GLOBAL = "global"
+
+
+@dataclass
+class CachePolicy:
+    """How the results of one tool are cached.
+
+    Attributes:
+        ttl: Seconds a result stays valid
+        max_entries: Maximum number of results kept for the tool (LRU eviction)
+        scope: "session" to cache per live session, "global" to share across sessions
+        key: Optional function mapping the call's keyword arguments to a cache key
+        paths: Optional function mapping the call's keyword arguments to the
+            files the result will be read from; their mtimes are taken before
+            the tool runs and the entry is invalidated when any of them change
+        on_hit: Optional function called with (result, tool_context) when a
+            call is answered from cache, to apply the tool's state updates
+    """
+
+    ttl: float = 30.0
+    max_entries: int = 64
+    scope: str = SCOPE_SESSION
+    key: Optional[Callable[[Dict[str, Any]], Hashable]] = None
+    paths: Optional[Callable[[Dict[str, Any]], Iterable[Any]]] = None
+    on_hit: Optional[Callable[[Any, Any], None]] = None
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+    mtimes: Dict[str, Optional[int]]
+
+
+def _file_mtime(path: str) -> Optional[int]:
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def snapshot_mtimes(policy: CachePolicy, kwargs: Dict[str, Any]) -> Optional[Dict[str, Optional[int]]]:
+    """Modification times of the files a call will read, or None if they cannot be named."""
+    if policy.paths is None:
+        return {}
+    try:
+        return {str(path): _file_mtime(str(path)) for path in policy.paths(kwargs)}
+    except Exception:
+        # Results we cannot attribute to files are not cached
+        return None
+
+
+def _default_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    return (repr(args), tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+
+
+class ToolCache:
+    """LRU store of tool results keyed by (tool name, call key)."""
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, tool: str, key: Hashable) -> Tuple[bool, Any]:
+        """Look up a cached result.
+
+        Returns:
+            (True, value) on a hit, (False, None) on a miss or stale entry
+        """
+        entry = self._entries.get((tool, key))
+        if entry is None:
+            return False, None
+
+        stale = entry.expires_at < time.monotonic() or any(
+            _file_mtime(path) != mtime for path, mtime in entry.mtimes.items()
+        )
+        if stale:
+            del self._entries[(tool, key)]
+            return False, None
+
+        self._entries.move_to_end((tool, key))
+        return True, entry.value
+
+    def put(
+        self,
+        tool: str,
+        key: Hashable,
+        value: Any,
+        policy: CachePolicy,
+        mtimes: Optional[Dict[str, Optional[int]]] = None,
+    ) -> None:
+        """Store a result according to the tool's policy.
+
+        `mtimes` are the modification times of the files the result was read
+        from, taken before the read (see `snapshot_mtimes`).
+        """
+        self._entries[(tool, key)] = _Entry(
+            value=value,
+            expires_at=time.monotonic() + policy.ttl,
+            mtimes=mtimes or {},
+        )
+        self._entries.move_to_end((tool, key))
+
+        # Evict the least recently used entries of this tool over the cap
+        tool_keys = [k for k in self._entries if k[0] == tool]
+        for k in tool_keys[: max(0, len(tool_keys) - policy.max_entries)]:
+            del self._entries[k]
+
+    def invalidate(self, tool: Optional[str] = None, path: Optional[str] = None) -> int:
+        """Drop cached entries.
+
+        Args:
+            tool: Only drop entries of this tool
+            path: Only drop entries that were read from this file
+
+        Returns:
+            The number of entries removed
+        """
+        resolved = str(Path(path).resolve()) if path is not None else None
+        removed = 0
+        for k, entry in list(self._entries.items()):
+            if tool is not None and k[0] != tool:
+                continue
+            if resolved is not None and not any(
+                str(Path(p).resolve()) == resolved for p in entry.mtimes
+            ):
+                continue
+            del self._entries[k]
+            removed += 1
+        return removed
+
+
+# Cache shared by every session in this process
+GLOBAL_TOOL_CACHE = ToolCache()
+
+
+def _record_lookup(tool: str, hit: bool) -> None:
+    METRICS.incr(f"tool_cache.{tool}.{'hits' if hit else 'misses'}")
+    hits = METRICS.get(f"tool_cache.{tool}.hits")
+    misses = METRICS.get(f"tool_cache.{tool}.misses")
+    METRICS.set_gauge(f"tool_cache.{tool}.hit_rate", hits / (hits + misses))
+
+
+def memoize(
+    func: Callable[..., Any],
+    policy: CachePolicy,
+    session_cache: Optional[ToolCache] = None,
+) -> Callable[..., Any]:
+    """Wrap an async tool so repeated calls are served from cache.
+
+    The `tool_context` argument is never part of the key. Results containing
+    an "error" key are not cached.
+
+    Args:
+        func: The async tool function to wrap
+        policy: Caching policy for this tool
+        session_cache: Cache used for session-scoped policies
+
+    Returns:
+        An async function with the same name, docstring and signature
+    """
+    name = func.__name__
+    if policy.scope == SCOPE_GLOBAL or session_cache is None:
+        cache = GLOBAL_TOOL_CACHE
+    else:
+        cache = session_cache
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key_kwargs = {k: v for k, v in kwargs.items() if k != "tool_context"}
+        if policy.key is not None:
+            key = policy.key(key_kwargs)
+        else:
+            key = _default_key(args, key_kwargs)
+
+        hit, value = cache.get(name, key)
+        _record_lookup(name, hit)
+        if hit:
+            print(f"[TOOL CACHE]: hit for {name}")
+            if policy.on_hit is not None:
+                policy.on_hit(value, kwargs.get("tool_context"))
+            return value
+
+        # Taken before the read, so a write during it invalidates the entry
+        mtimes = snapshot_mtimes(policy, key_kwargs)
+        value = await func(*args, **kwargs)
+        if mtimes is not None and not (isinstance(value, dict) and "error" in value):
+            cache.put(name, key, value, policy, mtimes)
+        return value
+
+    return wrapper
+
+
+__all__ = [
+    "CachePolicy",
+    "ToolCache",
+    "GLOBAL_TOOL_CACHE",
+    "SCOPE_SESSION",
+    "SCOPE_GLOBAL",
+    "memoize",
+    "snapshot_mtimes",
+]
@@ -0,0 +1,179 @@
+"""Concurrent tool dispatch with per-tool deadlines and cancellation.
+
+ADK already gathers the function calls of a live turn concurrently. The
+dispatcher wraps each tool so that every call runs as its own tracked task
+with a deadline, synchronous tools run in a worker thread, and a session that
+ends can cancel whatever is still in flight.
+
+A deadline can only interrupt a tool at an await: tools must keep blocking
+work such as file reads off the event loop (see `open_project_file`), and a
+timed-out worker thread still runs to completion in the background.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Default deadline in seconds for a single tool call
+DEFAULT_TOOL_TIMEOUT = 10.0
+
+# Per-tool deadlines in seconds, keyed by tool function name. get_selected_text
+# limits itself to selection.SELECTION_TIME_BUDGET_S (3.5 s) plus at most about
+# 1.5 s of clipboard I/O, so it has restored the clipboard before its deadline.
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "open_project_file": 5.0,
+    "read_context_file": 5.0,
+    "get_selected_text": 6.0,
+}
+
+class ToolDispatcher:
+    """Run tool calls as tracked tasks with deadlines.
+
+    One dispatcher is created per live session so that `cancel_all()` only
+    affects the tools started by that session.
+    """
+
+    def __init__(
+        self,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+        label: str = "",
+    ):
+        # Prefix of tool task names, used to attribute event-loop stalls
+        self.label = label
+        self.timeouts = dict(TOOL_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.default_timeout = default_timeout
+        self._inflight: set[asyncio.Task] = set()
+
+    @property
+    def inflight(self) -> int:
+        """Number of tool calls currently running."""
+        return len(self._inflight)
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.default_timeout)
+
+    async def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a single tool call under its deadline.
+
+        Synchronous tools are run in a worker thread so they do not block the
+        event loop. On timeout or cancellation an error dict is returned in
+        place of the tool result so the model still gets an answer.
+        """
+        name = getattr(func, "__name__", "tool")
+        timeout = self.timeout_for(name)
+
+        if inspect.iscoroutinefunction(func):
+            coro = func(*args, **kwargs)
+        else:
+            coro = asyncio.to_thread(func, *args, **kwargs)
+
+        task = asyncio.ensure_future(coro)
+        task.set_name(f"{self.label} tool:{name}".strip())
+        self._inflight.add(task)
+        started = time.perf_counter()
+        try:
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done:
+                task.cancel()
+                print(f"[TOOL DISPATCH]: {name} timed out after {timeout}s")
+                return {"error": f"Tool {name} timed out after {timeout}s", "timed_out": True}
+            if task.cancelled():
+                return {"error": f"Tool {name} was cancelled", "cancelled": True}
+            return task.result()
+        finally:
+            # Also reached when the caller itself is cancelled
+            if not task.done():
+                task.cancel()
+            self._inflight.discard(task)
+            elapsed = time.perf_counter() - started
+            print(f"[TOOL DISPATCH]: {name} finished in {elapsed:.3f}s")
+
+    def wrap(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap a tool function so every call goes through `call()`.
+
+        The wrapper keeps the name, docstring and signature of the original
+        function, which ADK uses to build the function declaration.
+        """
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return await self.call(func, *args, **kwargs)
+
+        return wrapper
+
+    def cancel_all(self) -> int:
+        """Cancel every in-flight tool call, e.g. when the session ends.
+
+        Returns:
+            The number of calls that were cancelled
+        """
+        cancelled = 0
+        for task in list(self._inflight):
+            if not task.done():
+                task.cancel()
+                cancelled += 1
+        if cancelled:
+            print(f"[TOOL DISPATCH]: cancelled {cancelled} in-flight tool call(s)")
+        return cancelled
+
+
+async def _benchmark(size_mb: int = 40, n_calls: int = 4) -> None:
+    """Read a large project file with the real `open_project_file` tool.
+
+    Runs `n_calls` concurrent calls through the dispatcher, the way ADK gathers
+    the function calls of a live turn, while a ticker measures how long the
+    event loop is blocked. For comparison the same read is done inline on the
+    loop, as the tool did before it moved file I/O to a worker thread.
+    """
+    import tempfile
+    from pathlib import Path
+
+    from tools.file_open import make_file_open_tool
+    from tools.workspace import WorkspaceRegistry
+
+    async def run(tool: Callable[..., Any]) -> Tuple[float, float]:
+        max_gap = 0.0
+        stop = asyncio.Event()
+
+        async def ticker() -> None:
+            nonlocal max_gap
+            last = time.perf_counter()
+            while not stop.is_set():
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                max_gap = max(max_gap, now - last)
+                last = now
+
+        ticking = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await asyncio.gather(*(dispatcher.call(tool, path="big.txt") for _ in range(n_calls)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await ticking
+        return elapsed, max_gap
+
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "big.txt").write_text(("x" * 79 + "\n") * (size_mb * 1024 * 1024 // 80))
+        open_project_file = make_file_open_tool(workspace=WorkspaceRegistry(roots=[tmp]))
+
+        async def inline_open(path: str) -> Dict[str, Any]:
+            return {"path": path, "content": (Path(tmp) / path).read_text(encoding="utf-8")}
+
+        dispatcher = ToolDispatcher(default_timeout=60.0)
+        for name, tool in (("inline read", inline_open), ("open_project_file", open_project_file)):
+            elapsed, max_gap = await run(tool)
+            print(f"{name:18} {n_calls} x {size_mb} MB: {elapsed:.3f}s, event loop blocked up to {max_gap * 1000:.0f} ms")
+
+
+__all__ = ["ToolDispatcher", "DEFAULT_TOOL_TIMEOUT", "TOOL_TIMEOUTS"]
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
@@ -1,10 +1,35 @@
-"""Tools package for the Pikachu Pair Programming Agent."""
+"""Tools package for the Pikachu Pair Programming Agent.
+
+Tool modules are imported on first access (PEP 562), so importing the package
+does not pull in google.adk or the macOS helpers until a tool is needed.
+"""
+from importlib import import_module
+
+# Exported name -> submodule that defines it
+_EXPORTS = {
+    "make_clipboard_tool": ".clipboard",
+    "make_context_call_tool": ".context_call",
+    "make_cursor_move_tool": ".cursor_move",
+    "make_file_open_tool": ".file_open",
+    "make_selection_tool": ".selection",
+    "get_selected_text": ".selection",
+    "WorkspaceRegistry": ".workspace",
+    "WORKSPACE": ".workspace",
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
 
-from .clipboard import make_clipboard_tool
-from .context_call import make_context_call_tool
-from .cursor_move import make_cursor_move_tool
-from .file_open import make_file_open_tool
-from .selection import make_selection_tool, get_selected_text
 
 __all__ = [
     "make_clipboard_tool",
@@ -13,4 +38,6 @@ __all__ = [
     "make_file_open_tool",
     "make_selection_tool",
     "get_selected_text",
+    "WorkspaceRegistry",
+    "WORKSPACE",
 ]
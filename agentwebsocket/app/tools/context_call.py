@@ -1,29 +1,45 @@
-"""Context call tool for reading the Context.MD file from the demo directory."""
+"""Context call tool for reading the Context.MD file of the workspace."""
 from __future__ import annotations
 
-from pathlib import Path
+import asyncio
 from typing import Any, Callable, Dict, Optional
 
 from google.adk.tools import ToolContext
 
-# Path to the demo directory
-DEMO_DIR = Path("/Users/aryan/projects/Pikachu-Pair-Programming-Demo")
-CONTEXT_FILE = DEMO_DIR / "Context.MD"
+from .workspace import WORKSPACE, WorkspaceRegistry
 
 ContextCallCallable = Callable[..., Any]
 
 
-def make_context_call_tool() -> ContextCallCallable:
-    """Create an async callable that reads the Context.MD file from the demo directory.
+def record_context_read(tool_context: Optional[ToolContext], context_file: str) -> None:
+    """Count a read of the context file in the session's state."""
+    if tool_context is None:
+        return
+    context_reads = tool_context.state.get("context_reads")
+    if context_reads is None:
+        context_reads = 0
+    context_reads += 1
+    tool_context.state["context_reads"] = context_reads
+    tool_context.state["last_context_read"] = str(context_file)
+
+
+def make_context_call_tool(workspace: Optional[WorkspaceRegistry] = None) -> ContextCallCallable:
+    """Create an async callable that reads the Context.MD file of the workspace.
+    
+    Args:
+        workspace: Workspace whose context file is read, defaults to the configured one
     
     Returns:
         An async function that reads the Context.MD file and returns its contents
     """
+    if workspace is None:
+        workspace = WORKSPACE
+    context_file = workspace.context_file
 
     async def read_context_file(
         tool_context: Optional[ToolContext] = None
     ) -> Dict[str, Any]:
-        """Read the Context.MD file from the Pikachu-Pair-Programming-Demo directory.
+        """Read the Context.MD file of the current project.
         
         This tool provides access to the project context and guidelines that help
         the AI understand the current project's requirements, conventions, and goals.
@@ -34,31 +50,31 @@ def make_context_call_tool() -> ContextCallCallable:
         Returns:
             Dict with context file path and content, or error message
         """
+        if context_file is None:
+            return {
+                "error": "No context file is configured",
+                "suggestion": "Set context_file in the workspace config named by PIKACHU_WORKSPACE_CONFIG"
+            }
+
         try:
             # Check if the context file exists
-            if not CONTEXT_FILE.exists():
+            if not context_file.exists():
                 return {
-                    "error": f"Context.MD file not found at {CONTEXT_FILE}",
-                    "suggestion": "Make sure the Pikachu-Pair-Programming-Demo directory exists and contains Context.MD"
+                    "error": f"Context.MD file not found at {context_file}",
+                    "suggestion": "Make sure context_file in the workspace config points to an existing Context.MD"
                 }
             
-            if not CONTEXT_FILE.is_file():
-                return {"error": f"{CONTEXT_FILE} exists but is not a file"}
+            if not context_file.is_file():
+                return {"error": f"{context_file} exists but is not a file"}
             
-            # Read the context file content
-            content = CONTEXT_FILE.read_text(encoding="utf-8")
+            # Read the context file content off the event loop
+            content = await asyncio.to_thread(context_file.read_text, encoding="utf-8")
             
             # Track in tool context if available
-            if tool_context is not None:
-                context_reads = tool_context.state.get("context_reads")
-                if context_reads is None:
-                    context_reads = 0
-                context_reads += 1
-                tool_context.state["context_reads"] = context_reads
-                tool_context.state["last_context_read"] = str(CONTEXT_FILE)
+            record_context_read(tool_context, str(context_file))
                     
             return {
-                "path": str(CONTEXT_FILE),
+                "path": str(context_file),
                 "content": content,
                 "message": "Successfully read project context from Context.MD"
             }
@@ -69,4 +85,4 @@ def make_context_call_tool() -> ContextCallCallable:
     return read_context_file
 
 
-__all__ = ["make_context_call_tool"]
+__all__ = ["make_context_call_tool", "record_context_read"]
@@ -1,116 +1,87 @@
 """File open tool for reading project files."""
 from __future__ import annotations
 
-from pathlib import Path
+import asyncio
 from typing import Any, Callable, Dict, List, Optional
 
 from google.adk.tools import ToolContext
 
-# Root is 3 levels up from this file: app/tools/file_open.py -> app -> agentwebsocket -> project root
-ROOT = Path(__file__).resolve().parents[3]
+from .workspace import WORKSPACE, WorkspaceRegistry
+
+# Default project root, kept for callers that predate the workspace registry
+ROOT = WORKSPACE.roots[0]
 
 FileOpenCallable = Callable[..., Any]
 
 
-def make_file_open_tool(allowed_external_files: Optional[List[str]] = None) -> FileOpenCallable:
+def record_opened_file(tool_context: Optional[ToolContext], shown_path: str) -> None:
+    """Add `shown_path` to the session's opened_files state."""
+    if tool_context is None:
+        return
+    opened_files = tool_context.state.get("opened_files")
+    if opened_files is None:
+        opened_files = []
+    else:
+        opened_files = list(opened_files)
+    if shown_path not in opened_files:
+        opened_files.append(shown_path)
+        tool_context.state["opened_files"] = opened_files
+
+
+def make_file_open_tool(
+    allowed_external_files: Optional[List[str]] = None,
+    workspace: Optional[WorkspaceRegistry] = None,
+) -> FileOpenCallable:
     """Create an async callable that reads project files for the agent.
     
     Args:
-        allowed_external_files: Optional list of absolute paths to external files the agent can access
+        allowed_external_files: Optional list of absolute paths to external files the
+            agent can access, in addition to those of the workspace
+        workspace: Workspace the files are read from, defaults to the configured one
     
     Returns:
         An async function that opens and reads files from the project
     """
-    # Convert allowed external files to a set of resolved Path objects
-    external_files = set()
+    if workspace is None:
+        workspace = WORKSPACE
     if allowed_external_files:
-        for file_path in allowed_external_files:
-            try:
-                external_files.add(Path(file_path).resolve())
-            except Exception:
-                pass  # Skip invalid paths
+        workspace = workspace.extend(allowed_files=allowed_external_files)
 
     async def open_project_file(
         path: str, 
+        focus: Optional[str] = None,
         tool_context: Optional[ToolContext] = None
     ) -> Dict[str, Any]:
         """Open a repository file by relative path or absolute path and return its text contents.
         
+        Large files may be returned as an outline with line numbers. Pass focus to get
+        the lines around a line number or around matches of a search text instead.
+        
         Args:
-            path: Relative path from project root, absolute path, or filename of allowed external file
+            path: Relative path from a project root, absolute path, or filename of allowed external file
+            focus: Optional line number or text to return excerpts around when the file is large
             tool_context: Optional tool context for state tracking
             
         Returns:
             Dict with file path and content, or error message
         """
+        # Authorize and resolve the path against the workspace roots and allowlist
         try:
-            # First, check if path is an absolute path to an allowed external file
-            path_obj = Path(path)
-            if path_obj.is_absolute():
-                resolved_path = path_obj.resolve()
-                if resolved_path in external_files and resolved_path.exists() and resolved_path.is_file():
-                    content = resolved_path.read_text(encoding="utf-8")
-                    
-                    # Track in tool context if available
-                    if tool_context is not None:
-                        opened_files = tool_context.state.get("opened_files")
-                        if opened_files is None:
-                            opened_files = []
-                        else:
-                            opened_files = list(opened_files)
-                        if str(resolved_path) not in opened_files:
-                            opened_files.append(str(resolved_path))
-                            tool_context.state["opened_files"] = opened_files
-                            
-                    return {"path": str(resolved_path), "content": content}
-            
-            # Check if path matches the filename of any allowed external file
-            for external_file in external_files:
-                if external_file.name == path or external_file.name == Path(path).name:
-                    if external_file.exists() and external_file.is_file():
-                        content = external_file.read_text(encoding="utf-8")
-                        
-                        # Track in tool context if available
-                        if tool_context is not None:
-                            opened_files = tool_context.state.get("opened_files")
-                            if opened_files is None:
-                                opened_files = []
-                            else:
-                                opened_files = list(opened_files)
-                            if str(external_file) not in opened_files:
-                                opened_files.append(str(external_file))
-                                tool_context.state["opened_files"] = opened_files
-                                
-                        return {"path": str(external_file), "content": content}
-            
-            # Fallback to local project root for relative paths
-            resolved = (ROOT / path).resolve()
-            
-            # Security check: ensure file is within project root
-            if not resolved.exists():
-                return {"error": f"File {path} not found"}
-            
-            if not resolved.is_file():
-                return {"error": f"{path} is not a file"}
-                
-            if ROOT not in resolved.parents and resolved != ROOT:
-                return {"error": "Access outside repository root is not allowed"}
-            
-            # Read file content
-            content = resolved.read_text(encoding="utf-8")
-            
+            resolved, relative = await asyncio.to_thread(workspace.locate, path)
+        except (PermissionError, FileNotFoundError, IsADirectoryError) as e:
+            return {"error": str(e)}
+
+        try:
+            # Read file content off the event loop
+            content = await asyncio.to_thread(resolved.read_text, encoding="utf-8")
+
+            # Paths relative to a root are reported as given, others as resolved
+            shown_path = path if relative else str(resolved)
+
             # Track in tool context if available
-            if tool_context is not None:
-                opened_files = tool_context.state.get("opened_files")
-                if opened_files is None:
-                    opened_files = []
-                else:
-                    opened_files = list(opened_files)
-                if path not in opened_files:
-                    opened_files.append(path)
-                    tool_context.state["opened_files"] = opened_files
-                    
-            return {"path": path, "content": content}
+            record_opened_file(tool_context, shown_path)
+
+            return {"path": shown_path, "content": content}
             
         except Exception as e:
             return {"error": f"Error reading file {path}: {str(e)}"}
@@ -118,4 +89,4 @@ def make_file_open_tool(allowed_external_files: Optional[List[str]] = None) -> F
     return open_project_file
 
 
-__all__ = ["make_file_open_tool"]
+__all__ = ["make_file_open_tool", "record_opened_file"]
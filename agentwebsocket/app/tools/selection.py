@@ -17,6 +17,14 @@ import time
 import os
 from typing import Optional
 
+# Time budget for one get_selected_text call, including every retry. Kept below
+# the call's deadline in tool_dispatcher.TOOL_TIMEOUTS so the clipboard is
+# always restored before the session gives up on the call.
+SELECTION_TIME_BUDGET_S = 3.5
+
+# Upper bound for a single pbcopy/pbpaste
+CLIPBOARD_IO_TIMEOUT_S = 0.5
+
 
 def _run_osascript(script: str, timeout: float = 4.0) -> tuple[int, str, str]:
     """Run an AppleScript via `osascript`.
@@ -37,7 +45,7 @@ def _run_osascript(script: str, timeout: float = 4.0) -> tuple[int, str, str]:
         return 1, "", str(e)
 
 
-def _copy_via_menu_bar() -> bool:
+def _copy_via_menu_bar(timeout: float = 4.0) -> bool:
     """Attempt to trigger Edit > Copy from the frontmost app's menu bar.
 
     Returns True if the AppleScript ran without error (does not guarantee content),
@@ -63,7 +71,7 @@ def _copy_via_menu_bar() -> bool:
         '  end if\n'
         'end tell'
     )
-    code, out, err = _run_osascript(script)
+    code, out, err = _run_osascript(script, timeout=timeout)
     if code == 0 and out.strip():
         return True
     return False
@@ -72,7 +80,9 @@ def _copy_via_menu_bar() -> bool:
 def _pbpaste() -> str:
     try:
         # Prefer plain text to avoid rich/textless formats
-        out = subprocess.check_output(["/usr/bin/pbpaste", "-Prefer", "txt"])  # bytes
+        out = subprocess.check_output(
+            ["/usr/bin/pbpaste", "-Prefer", "txt"], timeout=CLIPBOARD_IO_TIMEOUT_S
+        )  # bytes
         return out.decode("utf-8", errors="replace")
     except Exception:
         return ""
@@ -80,8 +90,7 @@ def _pbpaste() -> str:
 
 def _pbcopy(text: str) -> None:
     try:
-        proc = subprocess.Popen(["/usr/bin/pbcopy"], stdin=subprocess.PIPE)
-        proc.communicate(input=text.encode("utf-8"))
+        subprocess.run(["/usr/bin/pbcopy"], input=text.encode("utf-8"), timeout=CLIPBOARD_IO_TIMEOUT_S)
     except Exception:
         pass
 
@@ -89,7 +98,11 @@ def _pbcopy(text: str) -> None:
 # Screenshot capture logic removed for text-only behavior
 
 
-def get_selected_text(retry_attempts: int = 2, delay_after_copy_s: float = 0.2) -> str:
+def get_selected_text(
+    retry_attempts: int = 2,
+    delay_after_copy_s: float = 0.2,
+    max_total_s: float = SELECTION_TIME_BUDGET_S,
+) -> str:
     """Return the current selected text from the frontmost app on macOS.
 
     Saves the clipboard, sends Cmd+C, waits briefly, reads the new clipboard
@@ -98,6 +111,8 @@ def get_selected_text(retry_attempts: int = 2, delay_after_copy_s: float = 0.2)
     Args:
         retry_attempts: Number of retry attempts if first copy yields empty text.
         delay_after_copy_s: Sleep time after sending Cmd+C before reading clipboard.
+        max_total_s: Time budget for all attempts; AppleScript timeouts and
+            polling are cut to what is left of it.
 
     Returns:
         The captured selection text, or an empty string if unavailable.
@@ -106,24 +121,31 @@ def get_selected_text(retry_attempts: int = 2, delay_after_copy_s: float = 0.2)
     original_clip = _pbpaste()
 
     captured: str = ""
+    budget_ends = time.monotonic() + max_total_s
+
+    def remaining() -> float:
+        return budget_ends - time.monotonic()
 
     for attempt in range(max(1, retry_attempts + 1)):
+        if attempt > 0 and remaining() < 0.5:
+            break
+
         # Clear clipboard to detect fresh content from Copy action
         _pbcopy("")
 
         # Prefer using the menu bar Copy to avoid keystroke issues in some apps
-        used_menu = _copy_via_menu_bar()
-        if not used_menu:
+        used_menu = _copy_via_menu_bar(timeout=max(0.1, min(2.0, remaining())))
+        if not used_menu and remaining() > 0.1:
             # Fallback: Send Cmd+C to copy current selection
             copy_script = 'tell application "System Events" to keystroke "c" using command down'
-            _run_osascript(copy_script)
+            _run_osascript(copy_script, timeout=min(2.0, remaining()))
 
         # Poll for clipboard population, allowing slower apps to update
         # Slightly longer window on first try; shorter on subsequent attempts
         base_window = max(0.6, delay_after_copy_s)
         window = base_window if attempt == 0 else base_window * 0.75
-        deadline = time.time() + window
-        while time.time() < deadline:
+        deadline = time.monotonic() + max(0.06, min(window, remaining()))
+        while time.monotonic() < deadline:
             time.sleep(0.06)
             tmp = _pbpaste()
             if tmp:
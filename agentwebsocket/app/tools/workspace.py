@@ -0,0 +1,215 @@
+"""Workspace roots and file allowlists shared by the file tools.
+
+A `WorkspaceRegistry` holds the project roots the agent may read from, extra
+files it may read outside of them and the project's Context.MD. Roots and
+files are resolved once when the registry is built, so authorizing a path is
+a walk up its parents against a set of roots (O(depth)) or a single set
+lookup, and finding an allowed file by name is a dict lookup, no matter how
+long the lists grow.
+
+The registry is loaded from the JSON file named by `PIKACHU_WORKSPACE_CONFIG`:
+
+    {
+        "roots": ["/path/to/project", "../other-project"],
+        "allowed_files": ["/path/to/demo/app/page.tsx"],
+        "context_file": "/path/to/demo/Context.MD"
+    }
+
+Relative entries are relative to the config file. The first root is tried
+first for relative paths. Without a config file the defaults below are used.
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# Repository root, 3 levels up from this file: app/tools/workspace.py -> app -> agentwebsocket -> project root
+DEFAULT_ROOT = Path(__file__).resolve().parents[3]
+
+# Specific files the agent is allowed to access from external projects
+DEFAULT_ALLOWED_FILES = [
+    "/Users/aryan/projects/Pikachu-Pair-Programming-Demo/pokemon-app/app/page.tsx",
+]
+
+# Context file of the demo project
+DEFAULT_CONTEXT_FILE = "/Users/aryan/projects/Pikachu-Pair-Programming-Demo/Context.MD"
+
+# JSON file with the workspace configuration
+WORKSPACE_CONFIG = os.environ.get("PIKACHU_WORKSPACE_CONFIG")
+
+
+class WorkspaceRegistry:
+    """Resolved workspace roots and allowlisted files."""
+
+    def __init__(
+        self,
+        roots: Iterable[str | Path],
+        allowed_files: Iterable[str | Path] = (),
+        context_file: Optional[str | Path] = None,
+    ):
+        self.roots: List[Path] = []
+        for root in roots:
+            resolved = Path(os.path.realpath(root))
+            if resolved not in self.roots:
+                self.roots.append(resolved)
+        self._root_set: FrozenSet[str] = frozenset(str(root) for root in self.roots)
+
+        self.allowed_files: List[Path] = []
+        self._by_name: Dict[str, List[Path]] = {}
+        for file_path in allowed_files:
+            resolved = Path(os.path.realpath(file_path))
+            if resolved not in self._by_name.get(resolved.name, []):
+                self.allowed_files.append(resolved)
+                self._by_name.setdefault(resolved.name, []).append(resolved)
+        self._allowed_set: FrozenSet[str] = frozenset(str(p) for p in self.allowed_files)
+
+        self.context_file = Path(os.path.realpath(context_file)) if context_file else None
+
+    @classmethod
+    def from_config(cls, config_path: str | Path) -> "WorkspaceRegistry":
+        """Build a registry from a JSON config file."""
+        config_path = Path(config_path)
+        config = json.loads(config_path.read_text(encoding="utf-8"))
+        base = config_path.resolve().parent
+
+        def absolute(entry: str) -> Path:
+            return base / Path(entry).expanduser()
+
+        context_file = config.get("context_file")
+        return cls(
+            roots=[absolute(r) for r in config.get("roots") or [DEFAULT_ROOT]],
+            allowed_files=[absolute(f) for f in config.get("allowed_files", [])],
+            context_file=absolute(context_file) if context_file else None,
+        )
+
+    def extend(self, roots: Iterable[str | Path] = (), allowed_files: Iterable[str | Path] = ()) -> "WorkspaceRegistry":
+        """Return a registry with additional roots and allowed files, e.g. for one session."""
+        return WorkspaceRegistry(
+            roots=[*self.roots, *roots],
+            allowed_files=[*self.allowed_files, *allowed_files],
+            context_file=self.context_file,
+        )
+
+    def root_for(self, resolved: str) -> Optional[Path]:
+        """Return the root containing the resolved path `resolved`, if any."""
+        current = resolved
+        while True:
+            if current in self._root_set:
+                return Path(current)
+            parent = os.path.dirname(current)
+            if parent == current:
+                return None
+            current = parent
+
+    def is_allowed(self, resolved: str) -> bool:
+        """Whether the resolved path `resolved` may be read."""
+        return resolved in self._allowed_set or self.root_for(resolved) is not None
+
+    def locate(self, path: str) -> Tuple[Path, bool]:
+        """Find the file a tool was asked to read.
+
+        `path` may be absolute, the filename of an allowed file, or relative
+        to one of the roots.
+
+        Returns:
+            (resolved path, whether it was resolved relative to a root)
+
+        Raises:
+            PermissionError: The path is outside the workspace
+            FileNotFoundError: No such file in the workspace
+            IsADirectoryError: The path is not a file
+        """
+        if os.path.isabs(path):
+            resolved = os.path.realpath(path)
+            if self.is_allowed(resolved):
+                return _existing_file(resolved, path), False
+
+        # Allowed files can be referred to by their filename
+        matches = self._by_name.get(path) or self._by_name.get(os.path.basename(path))
+        for match in matches or ():
+            if match.is_file():
+                return match, False
+
+        if os.path.isabs(path):
+            raise PermissionError("Access outside the workspace is not allowed")
+
+        authorized = False
+        for root in self.roots:
+            resolved = os.path.realpath(os.path.join(root, path))
+            if self.root_for(resolved) is None:
+                continue
+            authorized = True
+            if os.path.exists(resolved):
+                return _existing_file(resolved, path), True
+        if not authorized:
+            raise PermissionError("Access outside the workspace is not allowed")
+        raise FileNotFoundError(f"File {path} not found")
+
+
+def _existing_file(resolved: str, path: str) -> Path:
+    if not os.path.exists(resolved):
+        raise FileNotFoundError(f"File {path} not found")
+    if not os.path.isfile(resolved):
+        raise IsADirectoryError(f"{path} is not a file")
+    return Path(resolved)
+
+
+def load_workspace(config_path: Optional[str | Path] = WORKSPACE_CONFIG) -> WorkspaceRegistry:
+    """Load the workspace from `config_path`, or the defaults when it is not set."""
+    if config_path:
+        return WorkspaceRegistry.from_config(config_path)
+    return WorkspaceRegistry(
+        roots=[DEFAULT_ROOT],
+        allowed_files=DEFAULT_ALLOWED_FILES,
+        context_file=DEFAULT_CONTEXT_FILE,
+    )
+
+
+# Workspace of this process, shared by the file tools
+WORKSPACE = load_workspace()
+
+
+def _benchmark(allowed: int = 5000, lookups: int = 2000) -> None:
+    """Compare path checks against a large allowlist: linear scans vs. the registry."""
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = [Path(tmp) / f"f{i}.ts" for i in range(allowed)]
+        for f in files[-10:]:
+            f.write_text("x")
+        registry = WorkspaceRegistry(roots=[DEFAULT_ROOT], allowed_files=files)
+        resolved_set = {f.resolve() for f in files}
+        targets = [str(f) for f in files[-10:]] * (lookups // 10)
+
+        def linear(path: str) -> Path:
+            # What the file tool used to do: resolve, then scan the allowlist by name
+            resolved = Path(path).resolve()
+            if resolved in resolved_set:
+                return resolved
+            for f in resolved_set:
+                if f.name == Path(path).name:
+                    return f
+            raise FileNotFoundError(path)
+
+        for name, func in (("linear", linear), ("registry", lambda p: registry.locate(p)[0])):
+            started = time.perf_counter()
+            for target in targets:
+                func(target)
+            elapsed = time.perf_counter() - started
+            print(f"{name:9} {elapsed / len(targets) * 1e6:8.1f} us per absolute path")
+
+            started = time.perf_counter()
+            for target in targets:
+                func(os.path.basename(target))
+            elapsed = time.perf_counter() - started
+            print(f"{name:9} {elapsed / len(targets) * 1e6:8.1f} us per filename ({allowed} allowed files)")
+
+
+__all__ = ["WorkspaceRegistry", "WORKSPACE", "load_workspace", "WORKSPACE_CONFIG"]
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -1,47 +1,236 @@
 """Helper utilities for integrating tools with WebSocket communication."""
 from __future__ import annotations
 
+import asyncio
 import json
-from typing import Any, Dict
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
 from fastapi import WebSocket
 
+# Maximum number of stream frames (audio, text, turn events) waiting to be sent
+# before producers are made to wait for the socket
+MAX_PENDING_STREAM_FRAMES = 256
+
+# Tool events where only the latest value matters
+COALESCED_TOOL_EVENTS = ("cursor_move",)
+
+
+class WebSocketChannel:
+    """Single writer for a client websocket with two priority lanes.
+
+    Stream frames (audio, text and turn events) are sent first and in order.
+    Tool events are only sent when the stream lane is empty; events that pile
+    up meanwhile are batched into one frame, and for `cursor_move` only the
+    latest position is kept.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_pending: int = MAX_PENDING_STREAM_FRAMES,
+        recorder: Optional[Any] = None,
+    ):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        # Optional SessionRecorder that is told about every frame sent
+        self.recorder = recorder
+        self._stream: Deque[str] = deque()
+        self._tool_events: List[Dict[str, Any]] = []
+        self._coalesced: Dict[str, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    def start(self) -> None:
+        """Start the background sender task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the sender task. Frames still queued are dropped."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    async def flush(self, timeout: float = 2.0) -> None:
+        """Wait until every queued frame has been sent, up to `timeout` seconds."""
+        if self._error is not None:
+            return
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    async def send_text(self, text: str) -> None:
+        """Queue a stream frame (audio, text or turn event)."""
+        self._check()
+        while len(self._stream) >= self.max_pending:
+            self._space.clear()
+            await self._space.wait()
+            self._check()
+        self._stream.append(text)
+        self._drained.clear()
+        self._wakeup.set()
+
+    async def send_tool_event(self, payload: Dict[str, Any]) -> None:
+        """Queue a tool event payload for the overlay."""
+        self._check()
+        event_type = payload.get("type")
+        if event_type in COALESCED_TOOL_EVENTS:
+            self._coalesced[event_type] = payload
+        else:
+            self._tool_events.append(payload)
+        self._drained.clear()
+        self._wakeup.set()
+
+    def _take_tool_frame(self) -> str:
+        events = self._tool_events + list(self._coalesced.values())
+        self._tool_events = []
+        self._coalesced = {}
+        if len(events) == 1:
+            message = {
+                "mime_type": "application/json",
+                "message_type": "tool_event",
+                "data": events[0],
+            }
+        else:
+            message = {
+                "mime_type": "application/json",
+                "message_type": "tool_event_batch",
+                "data": events,
+            }
+        print(f"[TOOL TO CLIENT]: {', '.join(e.get('type', 'unknown') for e in events)}")
+        return json.dumps(message)
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self._stream or self._tool_events or self._coalesced:
+                    if self._stream:
+                        text = self._stream.popleft()
+                        if len(self._stream) < self.max_pending:
+                            self._space.set()
+                    else:
+                        text = self._take_tool_frame()
+                    await self.websocket.send_text(text)
+                    if self.recorder is not None:
+                        self.recorder.outbound(text)
+                self._drained.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Surface send failures to the producers on their next call
+            self._error = e
+            self._space.set()
+            self._drained.set()
+
 
 class WebSocketToolHelper:
     """Helper class to send tool-specific messages via WebSocket."""
-    
-    def __init__(self, websocket: WebSocket):
-        self.websocket = websocket
-    
+
+    def __init__(self, channel: WebSocketChannel):
+        self.channel = channel
+
     async def send_tool_message(self, payload: Dict[str, Any]) -> None:
         """Send a tool-specific message to the client.
-        
+
         Args:
             payload: Dict containing the message data with 'type' field
         """
-        message = {
-            "mime_type": "application/json",
-            "message_type": "tool_event",
-            "data": payload
-        }
-        await self.websocket.send_text(json.dumps(message))
-        print(f"[TOOL TO CLIENT]: {payload.get('type', 'unknown')}")
+        await self.channel.send_tool_event(payload)
 
 
-def create_websocket_callback(websocket: WebSocket):
+def create_websocket_callback(channel: WebSocketChannel):
     """Create a callback function for tools to send WebSocket messages.
-    
+
     Args:
-        websocket: The WebSocket connection
-        
+        channel: The WebSocketChannel of the client connection
+
     Returns:
         An async callback function that tools can use
     """
-    helper = WebSocketToolHelper(websocket)
-    
+    helper = WebSocketToolHelper(channel)
+
     async def callback(payload: Dict[str, Any]) -> None:
         await helper.send_tool_message(payload)
-    
+
     return callback
 
 
-__all__ = ["WebSocketToolHelper", "create_websocket_callback"]
+async def _benchmark(chunks: int = 100, cursor_burst: int = 20) -> None:
+    """Measure audio frame jitter with heavy cursor traffic, direct vs. channel."""
+    import statistics
+    import time
+
+    frame_interval = 0.02
+    audio_frame = json.dumps({"mime_type": "audio/pcm", "data": "A" * 8000})
+
+    class FakeWebSocket:
+        def __init__(self):
+            self.lock = asyncio.Lock()
+            self.audio_times: List[float] = []
+
+        async def send_text(self, text: str) -> None:
+            # One writer at a time, cost grows with frame size
+            async with self.lock:
+                await asyncio.sleep(0.001 + len(text) / 50_000_000)
+                if text.startswith('{"mime_type": "audio/pcm"'):
+                    self.audio_times.append(time.perf_counter())
+
+    async def run(use_channel: bool) -> float:
+        ws = FakeWebSocket()
+        channel = WebSocketChannel(ws)  # type: ignore[arg-type]
+        channel.start()
+
+        async def send_audio():
+            for _ in range(chunks):
+                if use_channel:
+                    await channel.send_text(audio_frame)
+                else:
+                    await ws.send_text(audio_frame)
+                await asyncio.sleep(frame_interval)
+
+        async def send_cursor():
+            for i in range(chunks):
+                for j in range(cursor_burst):
+                    payload = {"type": "cursor_move", "x": j / cursor_burst, "y": 0.5, "label": None}
+                    if use_channel:
+                        await channel.send_tool_event(payload)
+                    else:
+                        await ws.send_text(json.dumps({
+                            "mime_type": "application/json",
+                            "message_type": "tool_event",
+                            "data": payload,
+                        }))
+                await asyncio.sleep(frame_interval)
+
+        await asyncio.gather(send_audio(), send_cursor())
+        await asyncio.sleep(0.1)
+        await channel.close()
+        gaps = [b - a for a, b in zip(ws.audio_times, ws.audio_times[1:])]
+        return statistics.pstdev(gaps) * 1000
+
+    direct = await run(use_channel=False)
+    channelled = await run(use_channel=True)
+    print(f"audio jitter (stdev of frame gaps): direct {direct:.2f} ms, channel {channelled:.2f} ms")
+
+
+__all__ = ["WebSocketChannel", "WebSocketToolHelper", "create_websocket_callback"]
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app runs as a script directory with absolute imports (`from metrics import METRICS`)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
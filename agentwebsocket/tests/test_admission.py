@@ -0,0 +1,74 @@
+"""Tests for the per-session inbound limits."""
+import base64
+import json
+
+import admission
+from admission import SessionLimits
+from audio_frames import decode_audio_frame
+from metrics import METRICS
+
+# The browser client: 16 kHz mono, one frame per 128-sample AudioWorklet chunk
+SAMPLE_RATE = 16_000
+SAMPLES_PER_FRAME = 128
+FRAMES_PER_SECOND = SAMPLE_RATE / SAMPLES_PER_FRAME
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def client_audio_frame():
+    pcm = b"\x01\x00" * SAMPLES_PER_FRAME
+    # JSON.stringify in the browser: no spaces
+    return json.dumps({"mime_type": "audio/pcm", "data": base64.b64encode(pcm).decode("ascii")}, separators=(",", ":"))
+
+
+def test_live_microphone_stream_is_never_dropped(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock.monotonic)
+    limits = SessionLimits()
+    frame = client_audio_frame()
+
+    frames = int(30 * FRAMES_PER_SECOND)
+    allowed = 0
+    for _ in range(frames):
+        decoded = decode_audio_frame(frame)
+        assert decoded is not None
+        if limits.allow_audio(len(decoded)):
+            allowed += 1
+        clock.now += 1 / FRAMES_PER_SECOND
+
+    assert frames == 3750
+    assert allowed == frames
+
+
+def test_text_message_flood_is_limited(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock.monotonic)
+    limits = SessionLimits(message_rate=100, message_burst=200)
+    dropped_before = METRICS.get("inbound.messages_dropped")
+
+    allowed = 0
+    for _ in range(10 * 1000):
+        allowed += limits.allow_message()
+        clock.now += 0.001
+
+    assert allowed < 10 * 100 + 200 + 1
+    assert METRICS.get("inbound.messages_dropped") - dropped_before == 10 * 1000 - allowed
+
+
+def test_audio_over_byte_rate_is_dropped(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock.monotonic)
+    limits = SessionLimits(audio_bytes_rate=32_000, audio_bytes_burst=32_000)
+
+    # Four times the allowed byte rate for 10 s
+    allowed = 0
+    for _ in range(1250):
+        allowed += limits.allow_audio(1024)
+        clock.now += 1 / FRAMES_PER_SECOND
+    assert allowed * 1024 <= 32_000 * 11
@@ -0,0 +1,149 @@
+"""Tests for draining live sessions, with stand-ins for the socket and ADK."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+from drain import CLOSE_SERVICE_RESTART, LiveSession, SessionRegistry, resume_note
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = None
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+
+class FakeChannel(FakeWebSocket):
+    async def flush(self):
+        pass
+
+
+class FakeQueue:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSessionService:
+    def __init__(self, state=None, events=()):
+        self.session = SimpleNamespace(state=state or {}, events=list(events))
+
+    async def get_session(self, app_name, user_id, session_id):
+        return self.session
+
+
+def text_event(role, text):
+    return SimpleNamespace(content=SimpleNamespace(role=role, parts=[SimpleNamespace(text=text)]))
+
+
+def live_session(user_id="7"):
+    return LiveSession(
+        user_id=user_id,
+        session_id="s1",
+        channel=FakeChannel(),
+        live_request_queue=FakeQueue(),
+        websocket=FakeWebSocket(),
+    )
+
+
+def test_refuses_new_clients_while_draining(tmp_path):
+    registry = SessionRegistry(state_dir=tmp_path)
+    websocket = FakeWebSocket()
+    assert not asyncio.run(registry.refuse(websocket))
+
+    registry.draining = True
+    assert asyncio.run(registry.refuse(websocket))
+    assert websocket.sent == [{"error": "draining", "retry_after": 1}]
+    assert websocket.closed == CLOSE_SERVICE_RESTART
+
+
+def test_drain_waits_for_turn_until_deadline(tmp_path):
+    registry = SessionRegistry(state_dir=tmp_path)
+    service = FakeSessionService()
+
+    async def scenario():
+        finishing = registry.register(live_session("1"))
+        stuck = registry.register(live_session("2"))
+        finishing.turn_started()
+        stuck.turn_started()
+        asyncio.get_running_loop().call_later(0.05, finishing.turn_finished)
+
+        started = asyncio.get_running_loop().time()
+        result = await registry.drain(service, "app", deadline=0.3)
+        return result, asyncio.get_running_loop().time() - started, finishing, stuck
+
+    result, elapsed, finishing, stuck = asyncio.run(scenario())
+    assert result == {"handed_over": 2, "turns_cut_off": 1}
+    assert 0.3 <= elapsed < 1.0
+    for session in (finishing, stuck):
+        assert session.channel.sent[0]["message_type"] == "reconnect"
+        assert session.live_request_queue.closed
+        assert session.websocket.closed == CLOSE_SERVICE_RESTART
+
+
+def test_drain_does_not_wait_when_idle(tmp_path):
+    registry = SessionRegistry(state_dir=tmp_path)
+
+    async def scenario():
+        registry.register(live_session())
+        started = asyncio.get_running_loop().time()
+        result = await registry.drain(FakeSessionService(), "app", deadline=5)
+        return result, asyncio.get_running_loop().time() - started
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == {"handed_over": 1, "turns_cut_off": 0}
+    assert elapsed < 1.0
+
+
+def test_session_registered_after_drain_started_is_handed_over(tmp_path):
+    registry = SessionRegistry(state_dir=tmp_path)
+
+    async def scenario():
+        await registry.drain(FakeSessionService(), "app", deadline=0)
+        late = registry.register(live_session())
+        return late, await registry.hand_over_if_draining(late, FakeSessionService(), "app")
+
+    late, handed_over = asyncio.run(scenario())
+    assert handed_over
+    assert late.channel.sent[0]["message_type"] == "reconnect"
+    assert late.websocket.closed == CLOSE_SERVICE_RESTART
+
+
+def test_persisted_state_round_trips(tmp_path):
+    registry = SessionRegistry(state_dir=tmp_path)
+    service = FakeSessionService(
+        state={"open_file": "main.py"},
+        events=[text_event("user", "hi"), text_event("model", "Hello!")],
+    )
+
+    async def scenario():
+        session = registry.register(live_session("7"))
+        await registry.drain(service, "app", deadline=0)
+        return session.channel.sent[0]["resume_token"]
+
+    token = asyncio.run(scenario())
+    payload = registry.load(token, "7")
+    assert payload["state"] == {"open_file": "main.py"}
+    assert payload["transcript"] == [{"role": "user", "text": "hi"}, {"role": "model", "text": "Hello!"}]
+    assert "user: hi\nmodel: Hello!" in resume_note(payload["transcript"])
+
+
+def test_resume_tokens_are_single_use_and_bound_to_user(tmp_path):
+    registry = SessionRegistry(state_dir=tmp_path)
+    token = registry.persist("7", {"k": 1}, [])
+
+    assert registry.load(token, "8") is None
+    assert registry.load("../" + token, "7") is None
+    assert registry.load(token, "7")["state"] == {"k": 1}
+    assert registry.load(token, "7") is None
+
+
+def test_resume_note_is_empty_without_transcript():
+    assert resume_note([]) == ""
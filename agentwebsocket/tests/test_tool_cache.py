@@ -0,0 +1,86 @@
+"""Tests for memoized tool results."""
+import asyncio
+import os
+from types import SimpleNamespace
+
+from tool_cache import CachePolicy, ToolCache, memoize
+
+
+def make_reader(path, on_read=None):
+    """A file tool that records its reads in session state, like open_project_file."""
+    calls = []
+
+    async def read_file(path_arg: str, tool_context=None):
+        calls.append(path_arg)
+        content = path.read_text()
+        if on_read is not None:
+            on_read()
+        if tool_context is not None:
+            tool_context.state["reads"] = tool_context.state.get("reads", 0) + 1
+        return {"path": str(path), "content": content}
+
+    return read_file, calls
+
+
+def count_read(result, tool_context):
+    if tool_context is not None:
+        tool_context.state["reads"] = tool_context.state.get("reads", 0) + 1
+
+
+def policy(path, **kwargs):
+    return CachePolicy(ttl=60, key=lambda kw: kw.get("path_arg"), paths=lambda kw: [path], **kwargs)
+
+
+def test_hits_apply_state_updates(tmp_path):
+    path = tmp_path / "a.py"
+    path.write_text("one")
+    read_file, calls = make_reader(path)
+    cached = memoize(read_file, policy(path, on_hit=count_read), ToolCache())
+    context = SimpleNamespace(state={})
+
+    async def scenario():
+        for _ in range(3):
+            result = await cached(path_arg="a.py", tool_context=context)
+            assert result["content"] == "one"
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+    assert context.state["reads"] == 3
+
+
+def test_write_during_read_is_not_served_from_cache(tmp_path):
+    path = tmp_path / "a.py"
+    path.write_text("old")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+
+    def write_new_version():
+        # Lands after the content was read but before the tool returns
+        path.write_text("new")
+
+    read_file, calls = make_reader(path, on_read=write_new_version)
+    cached = memoize(read_file, policy(path), ToolCache())
+
+    async def scenario():
+        first = await cached(path_arg="a.py")
+        second = await cached(path_arg="a.py")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first["content"] == "old"
+    assert second["content"] == "new"
+    assert len(calls) == 2
+
+
+def test_unchanged_file_is_served_from_cache(tmp_path):
+    path = tmp_path / "a.py"
+    path.write_text("same")
+    read_file, calls = make_reader(path)
+    cached = memoize(read_file, policy(path), ToolCache())
+
+    async def scenario():
+        await cached(path_arg="a.py")
+        return await cached(path_arg="a.py")
+
+    assert asyncio.run(scenario())["content"] == "same"
+    assert len(calls) == 1
@@ -16,6 +16,10 @@ let isAssistantSpeaking = false;
 // Message tracking
 let currentMessageId = null;
 let websocket = null;
+// Delay before reconnecting; raised when the server asks us to retry later
+let reconnectDelayMs = 5000;
+// Token to resume the session after the server drains for a restart
+let resumeToken = null;
 
 // DOM elements
 const messagesDiv = document.getElementById("messages");
@@ -196,7 +200,8 @@ function showCursorIndicator(x, y, label) {
 // WebSocket handlers
 function connectWebSocket() {
   // Connect to WebSocket endpoint (always audio mode)
-  websocket = new WebSocket(ws_url);
+  websocket = new WebSocket(resumeToken ? ws_url + "?resume=" + resumeToken : ws_url);
+  resumeToken = null;
 
   // Handle connection open
   websocket.onopen = function () {
@@ -214,6 +219,19 @@ function connectWebSocket() {
     const message_from_server = JSON.parse(event.data);
     console.log("[AGENT TO CLIENT] ", message_from_server);
 
+    // Server is restarting; reconnect and pick the session back up
+    if (message_from_server.message_type == "reconnect") {
+      resumeToken = message_from_server.resume_token;
+      reconnectDelayMs = message_from_server.retry_after * 1000;
+      return;
+    }
+
+    // Server rejected the connection; wait as long as it asks before reconnecting
+    if (message_from_server.error && message_from_server.retry_after) {
+      reconnectDelayMs = Math.max(5000, message_from_server.retry_after * 1000);
+      return;
+    }
+
     // Check if the turn is complete
     // if turn complete, add new message
     if (message_from_server.turn_complete && message_from_server.turn_complete == true) {
@@ -258,6 +276,12 @@ function connectWebSocket() {
     ) {
       handleToolEvent(message_from_server.data);
     }
+    if (
+      message_from_server.mime_type == "application/json" &&
+      message_from_server.message_type == "tool_event_batch"
+    ) {
+      message_from_server.data.forEach(handleToolEvent);
+    }
   };
 
   // Handle connection close
@@ -268,7 +292,8 @@ function connectWebSocket() {
     setTimeout(function () {
       console.log("Reconnecting...");
       connectWebSocket();
-    }, 5000);
+    }, reconnectDelayMs);
+    reconnectDelayMs = 5000;
   };
 
   // Handle errors
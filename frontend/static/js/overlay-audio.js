@@ -124,6 +124,10 @@ let micStream = null;
 let isRecording = false;
 let isMuted = false;
 let isAssistantSpeaking = false;
+// Delay before reconnecting; raised when the server asks us to retry later
+let reconnectDelayMs = 1500;
+// Token to resume the session after the server drains for a restart
+let resumeToken = null;
 
 const sessionId = Math.random().toString().substring(10);
 const wsUrl = `ws://localhost:8000/ws/${sessionId}?is_audio=true`;
@@ -148,7 +152,8 @@ function base64ToArray(base64) {
 }
 
 function connectWebSocket() {
-  websocket = new WebSocket(wsUrl);
+  websocket = new WebSocket(resumeToken ? `${wsUrl}&resume=${resumeToken}` : wsUrl);
+  resumeToken = null;
 
   websocket.onopen = () => {
     window.pikachuAPI.setListening("connected (audio mode)");
@@ -164,6 +169,16 @@ function connectWebSocket() {
 
   websocket.onmessage = (event) => {
     const msg = JSON.parse(event.data);
+    if (msg.message_type === "reconnect") {
+      // Server is restarting; reconnect and pick the session back up
+      resumeToken = msg.resume_token;
+      reconnectDelayMs = msg.retry_after * 1000;
+      return;
+    }
+    if (msg.error && msg.retry_after) {
+      reconnectDelayMs = Math.max(1500, msg.retry_after * 1000);
+      return;
+    }
     if (msg.turn_complete) {
       isAssistantSpeaking = false;
       return;
@@ -184,12 +199,16 @@ function connectWebSocket() {
     } else if (msg.mime_type === "application/json" && msg.message_type === "tool_event") {
       // Handle tool events
       handleToolEvent(msg.data);
+    } else if (msg.mime_type === "application/json" && msg.message_type === "tool_event_batch") {
+      // Several tool events coalesced into one frame by the server
+      msg.data.forEach(handleToolEvent);
     }
   };
 
   websocket.onclose = () => {
     if (isRecording) {
-      setTimeout(connectWebSocket, 1500);
+      setTimeout(connectWebSocket, reconnectDelayMs);
+      reconnectDelayMs = 1500;
     }
   };
 }
@@ -0,0 +1,162 @@
+# file: admin_api_stub.py
+"""
+Local stand-in for the Cursor Admin API's filtered-usage-events, on http.server.
+Used by the tests and by the batch benchmark:
+
+    python admin_api_stub.py [--ids 200] [--latency 0.02]
+"""
+import json
+import time
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl
+
+from cursor_admin_client import USAGE_EVENTS_PATH
+
+# (status, json body, extra headers); returning None falls through to the default answer
+Responder = Callable[[str, str, Dict[str, Any]], Optional[Tuple[int, Dict[str, Any], Dict[str, str]]]]
+
+
+class StubAdminAPI(ThreadingHTTPServer):
+    """
+    Answers filtered-usage-events for {"requestId": ...} with one usage event per id,
+    or none for ids in `empty_ids`. Records every request and the peak number in flight.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, responder: Optional[Responder] = None):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.responder = responder
+        self.empty_ids = set()
+        self.requests: List[Tuple[str, Dict[str, Any]]] = []
+        self.inflight = 0
+        self.max_inflight = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self) -> "StubAdminAPI":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def fetches(self, request_id: str) -> int:
+        """Number of requests made for `request_id`."""
+        return sum(1 for _, query in self.requests if query.get("requestId") == request_id)
+
+    def answer(self, method: str, path: str, query: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        if self.responder is not None:
+            answer = self.responder(method, path, query)
+            if answer is not None:
+                return answer
+        if path != USAGE_EVENTS_PATH:
+            return 404, {"error": "not found"}, {}
+        request_id = query.get("requestId")
+        events = [] if request_id in self.empty_ids else [{
+            "requestId": request_id,
+            "model": "claude-4-sonnet",
+            "timestamp": str(int(time.time() * 1000)),
+            "tokenUsage": {"inputTokens": 1200, "outputTokens": 300, "totalCents": 1.5},
+        }]
+        return 200, {"usageEvents": events, "pagination": {"hasNextPage": False}}, {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are separate writes; without this, delayed ACKs add ~40 ms per request
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _handle(self, method: str) -> None:
+        server: StubAdminAPI = self.server  # type: ignore[assignment]
+        url = urlparse(self.path)
+        if method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            query = json.loads(self.rfile.read(length) or b"{}")
+        else:
+            query = dict(parse_qsl(url.query))
+
+        with server._lock:
+            server.requests.append((method, query))
+            server.inflight += 1
+            server.max_inflight = max(server.max_inflight, server.inflight)
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            status, body, headers = server.answer(method, url.path, query)
+        finally:
+            with server._lock:
+                server.inflight -= 1
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def log_message(self, *args):
+        pass
+
+
+def _benchmark(ids: int = 200, latency: float = 0.02) -> None:
+    """Batch lookup throughput against the stub: sequential, concurrent, and from a warm cache."""
+    import os
+    import asyncio
+    import tempfile
+    from cursor_admin_client import CursorAdminClient
+    from pikachu_cursor_tool import fetch_usage_batch
+    from usage_cache import UsageCache
+
+    request_ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(ids)]
+
+    async def run(base_url: str, concurrency: int, cache: Optional[UsageCache]) -> float:
+        CursorAdminClient.negotiated_method = None
+        start = time.perf_counter()
+        async with CursorAdminClient("stub", base_url=base_url, prefer_post=True,
+                                     max_connections=concurrency) as client:
+            async for _ in fetch_usage_batch(client, request_ids, concurrency, cache):
+                pass
+        return time.perf_counter() - start
+
+    with StubAdminAPI(latency=latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        with UsageCache(os.path.join(tmp, "cache.sqlite")) as cache:
+            for name, concurrency, use_cache in (
+                ("concurrency 1", 1, None),
+                ("concurrency 16", 16, None),
+                ("cold cache, concurrency 16", 16, cache),
+                ("warm cache", 16, cache),
+            ):
+                elapsed = asyncio.run(run(stub.base_url, concurrency, use_cache))
+                print(f"{name:28} {ids / elapsed:8.1f} ids/s ({elapsed:.2f}s, {latency * 1000:.0f} ms handler latency)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--ids", type=int, default=200)
+    p.add_argument("--latency", type=float, default=0.02, help="Seconds each stub request takes")
+    args = p.parse_args()
+    _benchmark(args.ids, args.latency)
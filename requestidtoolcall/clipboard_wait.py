@@ -0,0 +1,168 @@
+# file: clipboard_wait.py
+import re
+import abc
+import time
+import threading
+import subprocess
+from typing import Optional, Tuple, Pattern
+
+try:
+    # pyobjc gives direct access to NSPasteboard's change counter (optional)
+    from AppKit import NSPasteboard, NSPasteboardTypeString  # type: ignore
+except Exception:
+    NSPasteboard = None
+
+
+class ClipboardBackend(abc.ABC):
+    """
+    Minimal clipboard interface used by wait_for_clipboard_match.
+    change_count() returns a counter that increases on every clipboard write,
+    or None if the backend cannot tell.
+    """
+
+    def change_count(self) -> Optional[int]:
+        return None
+
+    @abc.abstractmethod
+    def read(self) -> str:
+        ...
+
+    def write(self, text: str) -> None:
+        """Replaces the clipboard contents. Only needed by backends without a change counter."""
+
+    def clear(self) -> None:
+        self.write("")
+
+    def wait_for_change(self, since: Optional[int], timeout: float) -> None:
+        """Blocks until change_count() differs from `since` or `timeout` elapses."""
+        time.sleep(timeout)
+
+
+class PasteboardBackend(ClipboardBackend):
+    """macOS NSPasteboard via pyobjc: reading the change counter is an in-process call."""
+
+    poll_interval = 0.01
+
+    def __init__(self):
+        self._pb = NSPasteboard.generalPasteboard()
+
+    def change_count(self) -> Optional[int]:
+        return int(self._pb.changeCount())
+
+    def read(self) -> str:
+        return str(self._pb.stringForType_(NSPasteboardTypeString) or "")
+
+    def write(self, text: str) -> None:
+        self._pb.clearContents()
+        self._pb.setString_forType_(text, NSPasteboardTypeString)
+
+    def wait_for_change(self, since: Optional[int], timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while self.change_count() == since and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+
+
+class PbpasteBackend(ClipboardBackend):
+    """Fallback without a change counter: each read spawns /usr/bin/pbpaste."""
+
+    def read(self) -> str:
+        try:
+            return subprocess.check_output(["/usr/bin/pbpaste"], text=True)
+        except subprocess.CalledProcessError:
+            return ""
+
+    def write(self, text: str) -> None:
+        try:
+            subprocess.run(["/usr/bin/pbcopy"], input=text, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            pass
+
+
+class FakeClipboardBackend(ClipboardBackend):
+    """In-memory clipboard with change notification, for tests and non-macOS hosts."""
+
+    def __init__(self, text: str = ""):
+        self._text = text
+        self._count = 0
+        self._cond = threading.Condition()
+
+    def set_text(self, text: str) -> None:
+        with self._cond:
+            self._text = text
+            self._count += 1
+            self._cond.notify_all()
+
+    def change_count(self) -> Optional[int]:
+        with self._cond:
+            return self._count
+
+    def read(self) -> str:
+        with self._cond:
+            return self._text
+
+    def write(self, text: str) -> None:
+        self.set_text(text)
+
+    def wait_for_change(self, since: Optional[int], timeout: float) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._count != since, timeout=timeout)
+
+
+def default_backend() -> ClipboardBackend:
+    if NSPasteboard is not None:
+        return PasteboardBackend()
+    return PbpasteBackend()
+
+
+def wait_for_clipboard_match(
+    backend: ClipboardBackend,
+    pattern: Pattern[str],
+    timeout: float,
+    since: Optional[int] = None,
+    baseline: Optional[str] = None,
+) -> Tuple[Optional[str], float]:
+    """
+    Returns (first match of `pattern` in new clipboard contents, seconds waited).
+    Contents present before the wait (change count `since`, or text `baseline`
+    for backends without a counter) are ignored so a stale id is never returned.
+    Without a counter, clear the clipboard before taking `baseline`; otherwise a
+    new copy of the same text cannot be told apart from the old one.
+    Returns (None, waited) on timeout.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    counted = backend.change_count() is not None
+    # Adaptive polling for backends without a counter: fast at first, then back off
+    interval = 0.02
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if counted:
+            current = backend.change_count()
+            if current != since:
+                since = current
+                m = pattern.search(backend.read())
+                if m:
+                    return m.group(0), time.monotonic() - start
+            if remaining <= 0:
+                return None, time.monotonic() - start
+            backend.wait_for_change(since, remaining)
+        else:
+            text = backend.read()
+            if text != baseline:
+                m = pattern.search(text)
+                if m:
+                    return m.group(0), time.monotonic() - start
+            if remaining <= 0:
+                return None, time.monotonic() - start
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, 0.2)
+
+
+if __name__ == "__main__":
+    # Latency of the wait itself when a UUID shows up 150 ms after it starts
+    fake = FakeClipboardBackend("old")
+    since = fake.change_count()
+    threading.Timer(0.15, fake.set_text, args=("00000000-0000-0000-0000-000000000000",)).start()
+    match, waited = wait_for_clipboard_match(fake, re.compile(r"[0-9a-f-]{36}"), timeout=2.0, since=since)
+    print(f"{match} after {waited * 1000:.1f} ms (overhead {(waited - 0.15) * 1000:.1f} ms)")
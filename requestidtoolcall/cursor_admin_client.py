@@ -0,0 +1,168 @@
+# file: cursor_admin_client.py
+import os
+import math
+import base64
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple, AsyncIterator
+
+import httpx
+
+CURSOR_API_BASE = os.environ.get("CURSOR_API_BASE", "https://api.cursor.com")
+USAGE_EVENTS_PATH = "/teams/filtered-usage-events"
+
+# Statuses worth retrying after a backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Upper bound for any single retry delay, including a server's Retry-After
+MAX_BACKOFF = 30.0
+# Statuses that mean the endpoint wants the other HTTP method
+FALLBACK_STATUSES = (404, 405, 400)
+
+
+def _is_usable(status: int, data: dict) -> bool:
+    return status not in FALLBACK_STATUSES and not ("error" in data and not data.get("results"))
+
+
+class CursorAdminClient:
+    """
+    Async client for the Cursor Admin API.
+    One pooled keep-alive connection set per client; the Basic auth header is built once.
+    Whether filtered-usage-events answers POST or GET is negotiated once per process.
+    """
+
+    # Method that worked for filtered-usage-events, shared by all clients in the process
+    negotiated_method: Optional[str] = None
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = CURSOR_API_BASE,
+        timeout: float = 10.0,
+        max_connections: int = 8,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = MAX_BACKOFF,
+        prefer_post: bool = True,
+    ):
+        auth = base64.b64encode(f"{api_key}:".encode()).decode()
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Basic {auth}", "Content-Type": "application/json"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.prefer_post = prefer_post
+
+    async def __aenter__(self) -> "CursorAdminClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def _delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                seconds = float(retry_after)
+            except ValueError:
+                seconds = math.nan
+            if math.isfinite(seconds):
+                return min(max(seconds, 0.0), self.max_backoff)
+        # Full jitter: uniform in [0, backoff * 2^attempt], capped at max_backoff
+        return random.uniform(0, min(self.backoff * (2 ** attempt), self.max_backoff))
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[dict] = None,
+        params: Optional[dict] = None,
+    ) -> Tuple[int, dict]:
+        """
+        Sends one request with bounded retries on transport errors and 429/5xx.
+        Returns (status, json_body); status is 0 if the server could not be reached.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                resp = await self._client.request(method.upper(), path, json=body, params=params)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    return 0, {"error": str(e)}
+                await asyncio.sleep(self._delay(attempt))
+                continue
+
+            if resp.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                await asyncio.sleep(self._delay(attempt, resp.headers.get("Retry-After")))
+                continue
+
+            try:
+                return resp.status_code, resp.json() if resp.content else {}
+            except ValueError:
+                return resp.status_code, {"error": resp.text or f"HTTP {resp.status_code}"}
+
+        return 0, {"error": "retries exhausted"}
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        path: str,
+        body: Optional[dict] = None,
+        params: Optional[dict] = None,
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        Like request(), but yields the response before its body is read so it can be
+        consumed with resp.aiter_bytes(). Retries only happen before the body is streamed.
+        """
+        for attempt in range(self.max_retries + 1):
+            streaming = False
+            try:
+                async with self._client.stream(method.upper(), path, json=body, params=params) as resp:
+                    if resp.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                        delay = self._delay(attempt, resp.headers.get("Retry-After"))
+                    else:
+                        streaming = True
+                        yield resp
+                        return
+            except httpx.TransportError:
+                # Errors raised while the caller reads the body are not retried
+                if streaming or attempt == self.max_retries:
+                    raise
+                delay = self._delay(attempt)
+            await asyncio.sleep(delay)
+
+    def usage_events_method(self) -> str:
+        """The negotiated method for filtered-usage-events, or the preferred one."""
+        if type(self).negotiated_method is not None:
+            return type(self).negotiated_method
+        return "POST" if self.prefer_post else "GET"
+
+    async def _usage_events(self, method: str, filters: dict) -> Tuple[int, dict]:
+        if method == "GET":
+            return await self.request("GET", USAGE_EVENTS_PATH, params=filters)
+        return await self.request("POST", USAGE_EVENTS_PATH, body=filters)
+
+    async def filtered_usage_events(self, filters: dict) -> Tuple[int, dict]:
+        """
+        Queries filtered-usage-events with the given filters (e.g. {"requestId": ...}).
+        Uses the negotiated method if known, otherwise tries the preferred one and falls back.
+        """
+        cls = type(self)
+        if cls.negotiated_method is not None:
+            return await self._usage_events(cls.negotiated_method, filters)
+
+        first, second = ("POST", "GET") if self.prefer_post else ("GET", "POST")
+        status, data = await self._usage_events(first, filters)
+        method = first
+        if not _is_usable(status, data):
+            status, data = await self._usage_events(second, filters)
+            method = second
+        if status == 200 and _is_usable(status, data):
+            cls.negotiated_method = method
+        return status, data
@@ -1,13 +1,12 @@
-import os
 import re
-import json
 import time
-import base64
+import asyncio
 import subprocess
-from typing import Optional, Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Iterable, AsyncIterator, Optional
 
-import urllib.request
-import urllib.error
+from cursor_admin_client import CursorAdminClient, CURSOR_API_BASE
+from usage_cache import UsageCache
+from clipboard_wait import ClipboardBackend, default_backend, wait_for_clipboard_match
 
 UUID_RE = re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b")
 
@@ -29,22 +28,52 @@ def _run_osascript(script: str, timeout: float = 8.0) -> Tuple[int, str, str]:
         return 124, out, "AppleScript timed out"
     return proc.returncode, out, err
 
-def _pbpaste() -> str:
-    return subprocess.check_output(["/usr/bin/pbpaste"], text=True)
+# Poll step used by the UI driver while waiting for Cursor to become ready
+UI_POLL_S = 0.02
 
-def get_cursor_request_id_via_ui(max_wait: float = 8.0) -> str:
+def get_cursor_request_id_via_ui(
+    max_wait: float = 8.0,
+    backend: Optional[ClipboardBackend] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> str:
     """
     Opens View -> Command Palette... then runs 'Report AI Action' and clicks 'Copy Request ID'.
     This avoids global hotkeys so keystrokes cannot leak to another app.
+    Each UI step waits for Cursor to be ready (frontmost, palette focused, button present)
+    instead of sleeping a fixed amount, and the clipboard is watched for a change rather
+    than polled with pbpaste. If `timings` is given it is filled with the seconds spent
+    in the UI driver, waiting for the clipboard, and in total.
     """
-    applescript = r'''
+    backend = backend or default_backend()
+    since = backend.change_count()
+    baseline = None
+    original = None
+    if since is None:
+        # Without a change counter, copying the same id again would look like no change,
+        # so start from an empty clipboard and put the user's contents back afterwards
+        original = backend.read()
+        backend.clear()
+        baseline = backend.read()
+
+    applescript = r"""
     set appName to "Cursor"
+    set pollStep to __POLL__
     tell application appName to activate
-    delay 0.4
     tell application "System Events"
       if not (exists process appName) then error "Cursor is not running"
       tell process appName
-        set frontmost to true
+        -- Wait until Cursor is actually frontmost
+        set n to 0
+        repeat until frontmost or n > 40
+          delay pollStep
+          set n to n + 1
+        end repeat
+        set activateWaits to n
+
+        set focusedBefore to missing value
+        try
+          set focusedBefore to value of attribute "AXFocusedUIElement"
+        end try
         -- Prefer menu navigation over hotkeys
         try
           click menu item "Command Palette..." of menu "View" of menu bar 1
@@ -52,18 +81,30 @@ def get_cursor_request_id_via_ui(max_wait: float = 8.0) -> str:
           -- Fallback to hotkey if menu label changes
           keystroke "p" using {command down, shift down}
         end try
-      end tell
-    end tell
 
-    delay 0.5
-    tell application "System Events"
-      tell process appName
+        -- The palette is ready once its input takes focus
+        set n to 0
+        repeat while n < 25
+          try
+            if value of attribute "AXFocusedUIElement" is not focusedBefore then exit repeat
+          end try
+          delay pollStep
+          set n to n + 1
+        end repeat
+        set paletteWaits to n
+
         keystroke "Report AI Action"
-        delay 0.25
-        key code 125 -- Down arrow to highlight first match if needed
         delay 0.1
+        key code 125 -- Down arrow to highlight first match if needed
         key code 36  -- Return to open the panel
-        delay 0.9
+
+        -- Wait for the panel's copy button to appear
+        set n to 0
+        repeat until (exists button "Copy Request ID" of window 1) or n > 100
+          delay pollStep
+          set n to n + 1
+        end repeat
+        set panelWaits to n
 
         -- Click the copy button
         if exists button "Copy Request ID" of window 1 then
@@ -82,70 +123,109 @@ def get_cursor_request_id_via_ui(max_wait: float = 8.0) -> str:
         end if
       end tell
     end tell
-    delay 0.25
-    '''
-    code, _, err = _run_osascript(applescript, timeout=10.0)
-    if code != 0:
-        raise CursorRequestIdError(f"Failed to drive Cursor UI. Error: {err.strip()}")
-
-    deadline = time.time() + max_wait
-    while time.time() < deadline:
-        try:
-            clip = _pbpaste().strip()
-        except subprocess.CalledProcessError:
-            time.sleep(0.1)
-            continue
-        m = UUID_RE.search(clip)
-        if m:
-            return m.group(0)
-        time.sleep(0.2)
+    return (activateWaits as text) & " " & (paletteWaits as text) & " " & (panelWaits as text)
+    """.replace("__POLL__", str(UI_POLL_S))
+
+    start = time.monotonic()
+    try:
+        code, out, err = _run_osascript(applescript, timeout=10.0)
+        ui_s = time.monotonic() - start
+        if code != 0:
+            raise CursorRequestIdError(f"Failed to drive Cursor UI. Error: {err.strip()}")
+
+        request_id, clipboard_s = wait_for_clipboard_match(backend, UUID_RE, max_wait, since=since, baseline=baseline)
+    finally:
+        if original is not None:
+            backend.write(original)
+    if timings is not None:
+        timings["ui_s"] = ui_s
+        timings["clipboard_s"] = clipboard_s
+        timings["total_s"] = time.monotonic() - start
+        # Readiness waits per step, in poll steps: activate, palette, panel
+        for name, waits in zip(("activate", "palette", "panel"), out.split()):
+            timings[f"{name}_wait_s"] = int(waits) * UI_POLL_S
+    if request_id:
+        return request_id
 
     raise CursorRequestIdError("Clipboard did not contain a valid Cursor Request ID. Make a fresh AI action, ensure Privacy Mode is off, then retry.")
 
-def _http_request(method: str, url: str, api_key: str, body: Optional[dict] = None, timeout: float = 10.0) -> Tuple[int, dict]:
-    req = urllib.request.Request(url, method=method.upper())
-    auth = base64.b64encode(f"{api_key}:".encode()).decode()
-    req.add_header("Authorization", f"Basic {auth}")
-    req.add_header("Content-Type", "application/json")
-    data = None
-    if body is not None:
-        data = json.dumps(body).encode()
-    try:
-        with urllib.request.urlopen(req, data=data, timeout=timeout) as resp:
-            return resp.getcode(), json.loads(resp.read().decode() or "{}")
-    except urllib.error.HTTPError as e:
-        payload = e.read().decode() if hasattr(e, "read") else ""
-        try:
-            return e.code, json.loads(payload or "{}")
-        except Exception:
-            return e.code, {"error": payload or str(e)}
-    except urllib.error.URLError as e:
-        return 0, {"error": str(e)}
-
-def fetch_cursor_usage_for_active_request(api_key: str, prefer_post: bool = True) -> Dict[str, Any]:
+async def fetch_usage_for_request_id(client: CursorAdminClient, request_id: str) -> Dict[str, Any]:
+    """
+    Queries the Admin API for usage events matching one requestId.
+    Returns: {"request_id": "...", "status": ..., "events": {...raw response...}}
+    """
+    status, data = await client.filtered_usage_events({"requestId": request_id})
+    return {
+        "request_id": request_id,
+        "status": status,
+        "events": data,
+    }
+
+async def _iter_lines(lines: Iterable[str]) -> AsyncIterator[str]:
+    """Iterates `lines`; files and stdin are read in a worker thread so the event loop keeps running."""
+    readline = getattr(lines, "readline", None)
+    if readline is None:
+        for line in lines:
+            yield line
+        return
+    while True:
+        line = await asyncio.to_thread(readline)
+        if not line:
+            return
+        yield line
+
+async def fetch_usage_batch(
+    client: CursorAdminClient,
+    request_ids: Iterable[str],
+    concurrency: int = 8,
+    cache: Optional[UsageCache] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Looks up many requestIds with at most `concurrency` requests in flight.
+    `request_ids` is consumed lazily, so it can be a file or stdin stream.
+    Ids already resolved in `cache` are not fetched again (see UsageCache for empty answers);
+    new resolved results are stored.
+    Yields results in completion order; cached ones carry "cached": True.
+    """
+    seen = set()
+    pending = set()
+    async for request_id in _iter_lines(request_ids):
+        request_id = request_id.strip()
+        if not request_id or request_id in seen:
+            continue
+        seen.add(request_id)
+
+        cached = cache.get(request_id) if cache is not None else None
+        if cached is not None:
+            cached["cached"] = True
+            yield cached
+            continue
+
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if cache is not None:
+                    cache.put(result)
+                yield result
+        pending.add(asyncio.ensure_future(fetch_usage_for_request_id(client, request_id)))
+
+    for task in asyncio.as_completed(pending):
+        result = await task
+        if cache is not None:
+            cache.put(result)
+        yield result
+
+def fetch_cursor_usage_for_active_request(api_key: str, prefer_post: bool = True, base_url: str = CURSOR_API_BASE) -> Dict[str, Any]:
     """
     1) Grabs the latest Cursor requestId from the current UI
     2) Queries the Admin API for matching usage events
-    Returns: {"request_id": "...", "events": {...raw response...}}
+    Returns: {"request_id": "...", "status": ..., "events": {...raw response...}}
     """
     request_id = get_cursor_request_id_via_ui()
 
-    # Try POST first with a requestId filter, then fall back to GET with ?requestId=
-    base = "https://api.cursor.com/teams/filtered-usage-events"
-    status, data = (0, {})
-    if prefer_post:
-        status, data = _http_request("POST", base, api_key, {"requestId": request_id})
-        if status in (404, 405, 400) or ("error" in data and not data.get("results")):
-            status, data = _http_request("GET", f"{base}?requestId={request_id}", api_key)
-
-    else:
-        status, data = _http_request("GET", f"{base}?requestId={request_id}", api_key)
-        if status in (404, 405, 400) or ("error" in data and not data.get("results")):
-            status, data = _http_request("POST", base, api_key, {"requestId": request_id})
+    async def run() -> Dict[str, Any]:
+        async with CursorAdminClient(api_key, base_url=base_url, prefer_post=prefer_post) as client:
+            return await fetch_usage_for_request_id(client, request_id)
 
-    result = {
-        "request_id": request_id,
-        "status": status,
-        "events": data,
-    }
-    return result
\ No newline at end of file
+    return asyncio.run(run())
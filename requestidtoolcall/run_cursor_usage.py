@@ -1,24 +1,95 @@
 # file: run_cursor_usage.py
-import os, json, argparse
-from pikachu_cursor_tool import fetch_cursor_usage_for_active_request, get_cursor_request_id_via_ui
+import os, sys, json, time, asyncio, argparse
+from datetime import datetime, timezone
+from pikachu_cursor_tool import fetch_cursor_usage_for_active_request, get_cursor_request_id_via_ui, fetch_usage_batch
+from cursor_admin_client import CursorAdminClient, CURSOR_API_BASE
+from usage_cache import UsageCache, DEFAULT_CACHE_PATH
+from usage_export import export_usage, DEFAULT_PAGE_SIZE
+
+async def run_batch(api_key, args):
+    source = sys.stdin if args.batch == "-" else open(args.batch)
+    cache = None if args.no_cache else UsageCache(os.path.expanduser(args.cache))
+    counts = {"fetched": 0, "cached": 0, "failed": 0}
+    start = time.perf_counter()
+    try:
+        async with CursorAdminClient(api_key, base_url=args.api_base, prefer_post=args.prefer_post,
+                                     max_connections=args.concurrency) as client:
+            async for result in fetch_usage_batch(client, source, args.concurrency, cache):
+                if result.get("cached"):
+                    counts["cached"] += 1
+                elif result["status"] == 200:
+                    counts["fetched"] += 1
+                else:
+                    counts["failed"] += 1
+                print(json.dumps(result))
+    finally:
+        if cache is not None:
+            cache.close()
+        if source is not sys.stdin:
+            source.close()
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"{total} ids in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f}/s): "
+          f"{counts['fetched']} fetched, {counts['cached']} cached, {counts['failed']} failed", file=sys.stderr)
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+def _epoch_ms(day):
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+async def run_export(api_key, args):
+    # --end is inclusive: the export runs to the last millisecond of that day
+    filters = {"startDate": _epoch_ms(args.start), "endDate": _epoch_ms(args.end) + DAY_MS - 1}
+    start = time.perf_counter()
+    async with CursorAdminClient(api_key, base_url=args.api_base, prefer_post=args.prefer_post) as client:
+        aggregator = await export_usage(client, filters, args.export, fmt=args.format,
+                                        page_size=args.page_size, raw_events=args.raw_events)
+    elapsed = time.perf_counter() - start
+    print(f"{aggregator.events} events in {elapsed:.2f}s, aggregates written to {args.export}", file=sys.stderr)
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--request-id-only", action="store_true", help="Only copy and print the requestId")
+    p.add_argument("--timings", action="store_true", help="With --request-id-only, print capture latency to stderr")
     p.add_argument("--prefer-post", action="store_true", help="Use POST first to call the Admin API")
+    p.add_argument("--api-base", default=CURSOR_API_BASE, help="Admin API base URL (e.g. a local stub server)")
+    p.add_argument("--batch", metavar="FILE", help="Look up the requestIds in FILE (one per line, '-' for stdin) and print JSONL")
+    p.add_argument("--concurrency", type=int, default=8, help="Max Admin API requests in flight in batch mode")
+    p.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="SQLite cache of resolved requestIds for batch mode")
+    p.add_argument("--no-cache", action="store_true", help="Do not read or write the batch cache")
+    p.add_argument("--export", metavar="DIR", help="Export team usage between --start and --end as per-model/user/day aggregates")
+    p.add_argument("--start", help="Export start date (YYYY-MM-DD, UTC)")
+    p.add_argument("--end", help="Export end date, inclusive (YYYY-MM-DD, UTC)")
+    p.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="Aggregate file format for --export")
+    p.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Usage events per page for --export")
+    p.add_argument("--raw-events", action="store_true", help="Also write every event to events.jsonl in the export dir")
     args = p.parse_args()
 
     if args.request_id_only:
-        rid = get_cursor_request_id_via_ui()
+        timings = {}
+        rid = get_cursor_request_id_via_ui(timings=timings)
         print(rid)
+        if args.timings:
+            print(" ".join(f"{k}={v:.3f}" for k, v in timings.items()), file=sys.stderr)
         return
 
     api_key = os.environ.get("CURSOR_ADMIN_API_KEY")
     if not api_key:
         raise SystemExit("Set CURSOR_ADMIN_API_KEY in your environment")
 
-    result = fetch_cursor_usage_for_active_request(api_key, prefer_post=args.prefer_post)
+    if args.export:
+        if not (args.start and args.end):
+            raise SystemExit("--export needs --start and --end")
+        asyncio.run(run_export(api_key, args))
+        return
+
+    if args.batch:
+        asyncio.run(run_batch(api_key, args))
+        return
+
+    result = fetch_cursor_usage_for_active_request(api_key, prefer_post=args.prefer_post, base_url=args.api_base)
     print(json.dumps(result, indent=2))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The tool's modules are run as scripts from requestidtoolcall/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
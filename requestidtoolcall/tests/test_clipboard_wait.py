@@ -0,0 +1,89 @@
+# file: tests/test_clipboard_wait.py
+import threading
+
+import pytest
+
+import pikachu_cursor_tool
+from clipboard_wait import FakeClipboardBackend, wait_for_clipboard_match
+from pikachu_cursor_tool import UUID_RE, CursorRequestIdError, get_cursor_request_id_via_ui
+
+OLD_ID = "11111111-1111-1111-1111-111111111111"
+NEW_ID = "22222222-2222-2222-2222-222222222222"
+
+
+class NoCounterBackend(FakeClipboardBackend):
+    """Like PbpasteBackend: no change counter, so only the text can be compared."""
+
+    def change_count(self):
+        return None
+
+
+def later(delay, func, *args):
+    timer = threading.Timer(delay, func, args=args)
+    timer.start()
+    return timer
+
+
+def test_match_on_change():
+    backend = FakeClipboardBackend("nothing yet")
+    since = backend.change_count()
+    later(0.05, backend.set_text, f"Request ID: {NEW_ID}")
+    match, waited = wait_for_clipboard_match(backend, UUID_RE, timeout=2.0, since=since)
+    assert match == NEW_ID
+    assert waited < 1.0
+
+
+def test_stale_id_is_ignored():
+    backend = FakeClipboardBackend(OLD_ID)
+    since = backend.change_count()
+    later(0.1, backend.set_text, NEW_ID)
+    match, waited = wait_for_clipboard_match(backend, UUID_RE, timeout=2.0, since=since)
+    assert match == NEW_ID
+    assert waited >= 0.1
+
+
+def test_timeout():
+    backend = FakeClipboardBackend(OLD_ID)
+    match, waited = wait_for_clipboard_match(backend, UUID_RE, timeout=0.2, since=backend.change_count())
+    assert match is None
+    assert 0.2 <= waited < 1.0
+
+
+def test_baseline_without_change_counter():
+    backend = NoCounterBackend(OLD_ID)
+    match, _ = wait_for_clipboard_match(backend, UUID_RE, timeout=0.2, baseline=OLD_ID)
+    assert match is None
+
+    later(0.05, backend.set_text, NEW_ID)
+    match, _ = wait_for_clipboard_match(backend, UUID_RE, timeout=2.0, baseline=OLD_ID)
+    assert match == NEW_ID
+
+
+def fake_ui(backend, copied):
+    """Stands in for osascript: the Cursor panel copies `copied` to the clipboard."""
+    def run(script, timeout=8.0):
+        later(0.02, backend.set_text, copied)
+        return 0, "1 2 3", ""
+    return run
+
+
+def test_same_id_captured_twice_without_change_counter(monkeypatch):
+    backend = NoCounterBackend("user's own text")
+    monkeypatch.setattr(pikachu_cursor_tool, "_run_osascript", fake_ui(backend, OLD_ID))
+    assert get_cursor_request_id_via_ui(max_wait=2.0, backend=backend) == OLD_ID
+    assert get_cursor_request_id_via_ui(max_wait=2.0, backend=backend) == OLD_ID
+
+
+def test_clipboard_is_restored_without_change_counter(monkeypatch):
+    backend = NoCounterBackend("user's own text")
+    monkeypatch.setattr(pikachu_cursor_tool, "_run_osascript", fake_ui(backend, NEW_ID))
+    assert get_cursor_request_id_via_ui(max_wait=2.0, backend=backend) == NEW_ID
+    assert backend.read() == "user's own text"
+
+
+def test_clipboard_is_restored_when_the_ui_fails(monkeypatch):
+    backend = NoCounterBackend("user's own text")
+    monkeypatch.setattr(pikachu_cursor_tool, "_run_osascript", lambda script, timeout=8.0: (1, "", "boom"))
+    with pytest.raises(CursorRequestIdError):
+        get_cursor_request_id_via_ui(max_wait=0.2, backend=backend)
+    assert backend.read() == "user's own text"
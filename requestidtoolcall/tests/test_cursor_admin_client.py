@@ -0,0 +1,91 @@
+# file: tests/test_cursor_admin_client.py
+import time
+import asyncio
+
+import pytest
+
+import cursor_admin_client
+from admin_api_stub import StubAdminAPI
+from cursor_admin_client import CursorAdminClient, USAGE_EVENTS_PATH
+
+RID = "00000000-0000-0000-0000-000000000001"
+
+
+@pytest.fixture(autouse=True)
+def fresh_negotiation():
+    CursorAdminClient.negotiated_method = None
+    yield
+    CursorAdminClient.negotiated_method = None
+
+
+def failing_first(times, status, headers=None):
+    """Responder that answers `status` to the first `times` requests."""
+    failures = {"left": times}
+
+    def respond(method, path, query):
+        if failures["left"] > 0:
+            failures["left"] -= 1
+            return status, {"error": "unavailable"}, headers or {}
+        return None
+
+    return respond
+
+
+def call(stub, filters, **kwargs):
+    async def run():
+        async with CursorAdminClient("key", base_url=stub.base_url, **kwargs) as client:
+            return await client.filtered_usage_events(filters)
+
+    return asyncio.run(run())
+
+
+def test_503_is_retried_then_succeeds():
+    with StubAdminAPI(responder=failing_first(2, 503)) as stub:
+        status, data = call(stub, {"requestId": RID}, backoff=0.01, prefer_post=True)
+    assert status == 200
+    assert data["usageEvents"][0]["requestId"] == RID
+    assert len(stub.requests) == 3
+
+
+def test_retries_are_bounded():
+    with StubAdminAPI(responder=failing_first(10, 503)) as stub:
+        status, _ = call(stub, {"requestId": RID}, backoff=0.01, max_retries=2, prefer_post=True)
+    assert status == 503
+    # Both methods are tried once negotiation fails, each with max_retries retries
+    assert len(stub.requests) == 6
+
+
+def test_retry_after_is_clamped_to_max_backoff(monkeypatch):
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def record_sleep(delay):
+        delays.append(delay)
+        await real_sleep(delay)
+
+    monkeypatch.setattr(cursor_admin_client.asyncio, "sleep", record_sleep)
+    with StubAdminAPI(responder=failing_first(1, 429, {"Retry-After": "3600"})) as stub:
+        start = time.monotonic()
+        status, _ = call(stub, {"requestId": RID}, max_backoff=0.05, prefer_post=True)
+        elapsed = time.monotonic() - start
+    assert status == 200
+    assert delays == [0.05]
+    assert elapsed < 2.0
+
+
+def test_get_is_negotiated_once_and_reused():
+    def post_not_allowed(method, path, query):
+        if method == "POST" and path == USAGE_EVENTS_PATH:
+            return 405, {"error": "method not allowed"}, {}
+        return None
+
+    with StubAdminAPI(responder=post_not_allowed) as stub:
+        status, data = call(stub, {"requestId": RID}, prefer_post=True)
+        assert status == 200 and data["usageEvents"]
+        assert [m for m, _ in stub.requests] == ["POST", "GET"]
+        assert CursorAdminClient.negotiated_method == "GET"
+
+        # A later client in the same process goes straight to GET
+        status, _ = call(stub, {"requestId": RID}, prefer_post=True)
+        assert status == 200
+        assert [m for m, _ in stub.requests] == ["POST", "GET", "GET"]
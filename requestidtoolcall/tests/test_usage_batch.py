@@ -0,0 +1,72 @@
+# file: tests/test_usage_batch.py
+import io
+import time
+import asyncio
+
+import pytest
+
+from admin_api_stub import StubAdminAPI
+from cursor_admin_client import CursorAdminClient
+from pikachu_cursor_tool import fetch_usage_batch
+from usage_cache import UsageCache
+
+IDS = [f"00000000-0000-0000-0000-{i:012d}" for i in range(12)]
+
+
+@pytest.fixture
+def stub():
+    CursorAdminClient.negotiated_method = None
+    with StubAdminAPI(latency=0.02) as server:
+        yield server
+    CursorAdminClient.negotiated_method = None
+
+
+def run_batch(stub, request_ids, concurrency=4, cache=None):
+    async def run():
+        async with CursorAdminClient("key", base_url=stub.base_url, prefer_post=True) as client:
+            return [r async for r in fetch_usage_batch(client, request_ids, concurrency, cache)]
+
+    return asyncio.run(run())
+
+
+def test_duplicate_ids_are_skipped(stub):
+    lines = io.StringIO("".join(f"{rid}\n{rid}\n\n" for rid in IDS[:3]))
+    results = run_batch(stub, lines)
+    assert sorted(r["request_id"] for r in results) == IDS[:3]
+    assert len(stub.requests) == 3
+
+
+def test_concurrency_bound_is_respected(stub):
+    results = run_batch(stub, IDS, concurrency=3)
+    assert len(results) == len(IDS)
+    assert stub.max_inflight == 3
+
+
+def test_cached_id_is_never_fetched_again(stub, tmp_path):
+    with UsageCache(str(tmp_path / "cache.sqlite")) as cache:
+        first = run_batch(stub, IDS[:4], cache=cache)
+        second = run_batch(stub, IDS[:4], cache=cache)
+    assert not any(r.get("cached") for r in first)
+    assert all(r.get("cached") for r in second)
+    assert all(stub.fetches(rid) == 1 for rid in IDS[:4])
+
+
+def test_empty_answer_is_refetched_after_ttl(stub, tmp_path):
+    rid = IDS[0]
+    stub.empty_ids.add(rid)
+    with UsageCache(str(tmp_path / "cache.sqlite"), empty_ttl=0.2) as cache:
+        run_batch(stub, [rid], cache=cache)
+        assert run_batch(stub, [rid], cache=cache)[0].get("cached")
+        assert stub.fetches(rid) == 1
+
+        time.sleep(0.25)
+        stub.empty_ids.discard(rid)
+        result = run_batch(stub, [rid], cache=cache)[0]
+        assert not result.get("cached")
+        assert stub.fetches(rid) == 2
+        assert result["events"]["usageEvents"]
+
+        # Answers with events are kept for good
+        time.sleep(0.25)
+        assert run_batch(stub, [rid], cache=cache)[0].get("cached")
+    assert stub.fetches(rid) == 2
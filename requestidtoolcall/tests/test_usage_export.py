@@ -0,0 +1,133 @@
+# file: tests/test_usage_export.py
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cursor_admin_client import CursorAdminClient, USAGE_EVENTS_PATH
+from usage_export import iter_json_array, stream_usage_events
+
+
+def event(i):
+    return {"model": "claude-4-sonnet", "userEmail": f"u{i}@example.com", "timestamp": str(i), "note": "héllo"}
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves canned filtered-usage-events pages, a few bytes per chunk."""
+
+    def __init__(self, pages, chunk_size=7):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.pages = pages
+        self.chunk_size = chunk_size
+        self.requests = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != USAGE_EVENTS_PATH:
+            self.send_error(404)
+            return
+        query = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(query)
+        body = self.server.pages[query["page"] - 1].encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(body), self.server.chunk_size):
+            piece = body[i:i + self.server.chunk_size]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def page(events, has_next=None, pagination_first=False):
+    fields = [("usageEvents", events)]
+    if has_next is not None:
+        pagination = ("pagination", {"numPages": 9, "currentPage": 1, "hasNextPage": has_next})
+        fields.insert(0 if pagination_first else 1, pagination)
+    return json.dumps(dict(fields), ensure_ascii=False)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(pages):
+        server = StubServer(pages)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    CursorAdminClient.negotiated_method = None
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    CursorAdminClient.negotiated_method = None
+
+
+def collect(server, page_size):
+    async def run():
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        async with CursorAdminClient("key", base_url=base_url, prefer_post=True) as client:
+            return [e async for e in stream_usage_events(client, {"startDate": 0}, page_size=page_size)]
+
+    return asyncio.run(run())
+
+
+def test_events_split_across_chunks():
+    events = [event(i) for i in range(5)]
+    body = json.dumps({"usageEvents": events, "pagination": {"hasNextPage": False}}, ensure_ascii=False).encode()
+
+    async def one_byte_chunks():
+        for i in range(len(body)):
+            yield body[i:i + 1]
+
+    async def run():
+        outside = []
+        items = [item async for item in iter_json_array(one_byte_chunks(), "usageEvents", outside)]
+        return items, "".join(outside)
+
+    items, outside = asyncio.run(run())
+    assert items == events
+    assert '"hasNextPage": false' in outside
+
+
+def test_follows_has_next_page_past_a_short_page(serve):
+    server = serve([
+        page([event(0), event(1)], has_next=True),
+        page([event(2)], has_next=False, pagination_first=True),
+    ])
+    events = collect(server, page_size=3)
+    assert [e["timestamp"] for e in events] == ["0", "1", "2"]
+    assert [q["page"] for q in server.requests] == [1, 2]
+
+
+def test_stops_on_full_page_without_next(serve):
+    server = serve([
+        page([event(0), event(1), event(2)], has_next=False),
+        page([event(3)], has_next=False),
+    ])
+    events = collect(server, page_size=3)
+    assert len(events) == 3
+    assert [q["page"] for q in server.requests] == [1]
+
+
+def test_short_page_stops_without_pagination(serve):
+    server = serve([
+        page([event(0), event(1)]),
+        page([event(2)]),
+        page([event(3)]),
+    ])
+    events = collect(server, page_size=2)
+    assert [e["timestamp"] for e in events] == ["0", "1", "2"]
+    assert [q["page"] for q in server.requests] == [1, 2]
@@ -0,0 +1,80 @@
+# file: usage_cache.py
+import json
+import time
+import sqlite3
+from typing import Optional, Dict, Any
+
+DEFAULT_CACHE_PATH = "~/.cursor_usage_cache.sqlite"
+
+# Usage events can show up some time after the request; empty answers are only reused this long
+EMPTY_RESULT_TTL = 15 * 60.0
+
+
+def is_resolved(result: Dict[str, Any]) -> bool:
+    """A lookup can be stored once the API answered 200 without an error."""
+    events = result.get("events") or {}
+    return result.get("status") == 200 and "error" not in events
+
+
+def has_events(events: Dict[str, Any]) -> bool:
+    return bool(events.get("usageEvents"))
+
+
+class UsageCache:
+    """
+    On-disk index of resolved requestId -> usage lookup results.
+    Ids with usage events are never fetched again; answers without any are
+    refetched once they are older than `empty_ttl` seconds.
+    """
+
+    def __init__(self, path: str, commit_every: int = 100, empty_ttl: float = EMPTY_RESULT_TTL):
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            " request_id TEXT PRIMARY KEY,"
+            " status INTEGER NOT NULL,"
+            " events TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._commit_every = commit_every
+        self._empty_ttl = empty_ttl
+        self._uncommitted = 0
+
+    def __enter__(self) -> "UsageCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT status, events, fetched_at FROM usage WHERE request_id = ?", (request_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        events = json.loads(row[1])
+        if not has_events(events) and time.time() - row[2] > self._empty_ttl:
+            return None
+        return {"request_id": request_id, "status": row[0], "events": events}
+
+    def put(self, result: Dict[str, Any]) -> bool:
+        """Stores a result if it is resolved. Returns True if it was stored."""
+        if not is_resolved(result):
+            return False
+        self._db.execute(
+            "INSERT OR REPLACE INTO usage (request_id, status, events, fetched_at) VALUES (?, ?, ?, ?)",
+            (result["request_id"], result["status"], json.dumps(result["events"]), time.time()),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= self._commit_every:
+            self.commit()
+        return True
+
+    def commit(self) -> None:
+        self._db.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._db.close()
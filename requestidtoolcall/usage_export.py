@@ -0,0 +1,220 @@
+# file: usage_export.py
+import os
+import re
+import csv
+import json
+import codecs
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, AsyncIterator, IO, List
+
+from cursor_admin_client import CursorAdminClient, USAGE_EVENTS_PATH, FALLBACK_STATUSES
+
+DEFAULT_PAGE_SIZE = 500
+# Once this much of the buffer has been parsed it is dropped
+_TRIM_AT = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+_HAS_NEXT_PAGE_RE = re.compile(r'"hasNextPage"\s*:\s*(true|false)')
+
+
+async def iter_json_array(
+    chunks: AsyncIterator[bytes],
+    key: str,
+    outside: Optional[List[str]] = None,
+) -> AsyncIterator[Any]:
+    """
+    Incrementally parses the array stored under `key` in a streamed JSON object and
+    yields its items one at a time. Only the item being parsed is held in memory.
+    Items are expected to be JSON objects.
+    If `outside` is given, the JSON text before and after the array is appended to it,
+    so small sibling fields such as pagination can be read once the items are consumed.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    in_array = False
+    marker = json.dumps(key)
+
+    async for chunk in chunks:
+        buf += utf8.decode(chunk)
+        while True:
+            if not in_array:
+                start = buf.find(marker, pos)
+                if start < 0:
+                    # Keep enough of the tail to match a marker split across chunks
+                    pos = max(pos, len(buf) - len(marker))
+                    break
+                bracket = buf.find("[", start + len(marker))
+                if bracket < 0:
+                    break
+                in_array = True
+                if outside is not None:
+                    outside.append(buf[:bracket])
+                pos = bracket + 1
+
+            # Skip separators between items
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                if outside is not None:
+                    outside.append(buf[pos + 1:])
+                    async for rest in chunks:
+                        outside.append(utf8.decode(rest))
+                    outside.append(utf8.decode(b"", final=True))
+                return
+            try:
+                item, pos = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Item not complete yet, wait for more data
+                break
+            yield item
+
+        if pos > _TRIM_AT:
+            if outside is not None and not in_array:
+                outside.append(buf[:pos])
+            buf = buf[pos:]
+            pos = 0
+
+    if in_array:
+        raise ValueError(f"Stream ended before the {key} array was closed")
+
+
+def _new_totals() -> Dict[str, float]:
+    return {
+        "events": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_read_tokens": 0,
+        "cache_write_tokens": 0,
+        "cost_cents": 0.0,
+    }
+
+
+class UsageAggregator:
+    """
+    Running totals of tokens and cost per model, per user and per day.
+    Memory grows with the number of distinct keys, not with the number of events.
+    """
+
+    DIMENSIONS = ("model", "user", "day")
+
+    def __init__(self):
+        self.totals: Dict[str, Dict[str, Dict[str, float]]] = {d: {} for d in self.DIMENSIONS}
+        self.events = 0
+
+    @staticmethod
+    def _day(timestamp: Any) -> str:
+        try:
+            ts = float(timestamp) / 1000.0
+        except (TypeError, ValueError):
+            return "unknown"
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+    def add(self, event: Dict[str, Any]) -> None:
+        usage = event.get("tokenUsage") or {}
+        keys = {
+            "model": event.get("model") or "unknown",
+            "user": event.get("userEmail") or "unknown",
+            "day": self._day(event.get("timestamp")),
+        }
+        for dimension, key in keys.items():
+            row = self.totals[dimension].get(key)
+            if row is None:
+                row = self.totals[dimension][key] = _new_totals()
+            row["events"] += 1
+            row["input_tokens"] += usage.get("inputTokens") or 0
+            row["output_tokens"] += usage.get("outputTokens") or 0
+            row["cache_read_tokens"] += usage.get("cacheReadTokens") or 0
+            row["cache_write_tokens"] += usage.get("cacheWriteTokens") or 0
+            row["cost_cents"] += usage.get("totalCents") or 0.0
+        self.events += 1
+
+    def write(self, out_dir: str, fmt: str = "csv") -> None:
+        """Writes one file per dimension: by_model, by_user, by_day (.csv or .jsonl)."""
+        os.makedirs(out_dir, exist_ok=True)
+        columns = list(_new_totals())
+        for dimension in self.DIMENSIONS:
+            rows = sorted(self.totals[dimension].items())
+            path = os.path.join(out_dir, f"by_{dimension}.{fmt}")
+            with open(path, "w", newline="") as f:
+                if fmt == "csv":
+                    writer = csv.writer(f)
+                    writer.writerow([dimension] + columns)
+                    for key, row in rows:
+                        writer.writerow([key] + [row[c] for c in columns])
+                else:
+                    for key, row in rows:
+                        f.write(json.dumps({dimension: key, **row}) + "\n")
+
+
+async def stream_usage_events(
+    client: CursorAdminClient,
+    filters: Dict[str, Any],
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Pages through filtered-usage-events and yields events as they are parsed off the wire.
+    Follows pagination.hasNextPage; responses without it stop at the first page with
+    fewer than `page_size` events.
+    """
+    method = client.usage_events_method()
+    negotiated = type(client).negotiated_method is not None
+    page = 1
+    while True:
+        query = dict(filters, page=page, pageSize=page_size)
+        kwargs = {"params": query} if method == "GET" else {"body": query}
+        async with client.stream(method, USAGE_EVENTS_PATH, **kwargs) as resp:
+            if resp.status_code in FALLBACK_STATUSES and not negotiated and page == 1:
+                method = "GET" if method == "POST" else "POST"
+                negotiated = True
+                continue
+            if resp.status_code != 200:
+                body = (await resp.aread()).decode(errors="replace")
+                raise RuntimeError(f"filtered-usage-events page {page} failed: HTTP {resp.status_code} {body[:200]}")
+
+            count = 0
+            outside: List[str] = []
+            async for event in iter_json_array(resp.aiter_bytes(), "usageEvents", outside):
+                count += 1
+                yield event
+
+        type(client).negotiated_method = method
+        has_next = _HAS_NEXT_PAGE_RE.search("".join(outside))
+        if has_next is not None:
+            if has_next.group(1) == "false":
+                return
+        elif count < page_size:
+            return
+        page += 1
+
+
+async def export_usage(
+    client: CursorAdminClient,
+    filters: Dict[str, Any],
+    out_dir: str,
+    fmt: str = "csv",
+    page_size: int = DEFAULT_PAGE_SIZE,
+    raw_events: bool = False,
+) -> UsageAggregator:
+    """
+    Streams all usage events matching `filters` into per-model/user/day aggregates
+    written to `out_dir`. With raw_events, every event is also appended to events.jsonl.
+    """
+    aggregator = UsageAggregator()
+    events_file: Optional[IO[str]] = None
+    if raw_events:
+        os.makedirs(out_dir, exist_ok=True)
+        events_file = open(os.path.join(out_dir, "events.jsonl"), "w")
+    try:
+        async for event in stream_usage_events(client, filters, page_size):
+            aggregator.add(event)
+            if events_file is not None:
+                events_file.write(json.dumps(event) + "\n")
+    finally:
+        if events_file is not None:
+            events_file.close()
+    aggregator.write(out_dir, fmt)
+    return aggregator